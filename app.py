@@ -1,14 +1,22 @@
 import streamlit as st
 import hashlib
 import json
+import time
 from datetime import datetime
 import firebase_admin
 from firebase_admin import credentials, firestore
-import requests
 import pandas as pd
-import unicodedata
-from collections import defaultdict
 import logging
+from live_scoring import game_cache
+from nhl_client import get_client
+from players_table import build_player_table, game_log
+from lineup_matrix import LineupMatrix
+from score_index import build_score_index
+from scoring_rules import GOALIE_RULES, SCORING, lineup_rules, score_points
+from score_poller import FIRST_SNAPSHOT_TIMEOUT, ScorePoller, plan_next_poll, snapshot_age
+from config import SCORE_STORE
+from snapshot_store import FileSnapshotStore, FirestoreSnapshotStore, SQLiteSnapshotStore
+from team_repository import TeamRepository
 logging.basicConfig(level=logging.INFO)
 
 # --- OLYMPICS DEADLINE ---
@@ -89,174 +97,30 @@ def init_firebase():
 def get_db():
     return init_firebase()
 
-def clean_name(name):
-    """Normalisoi nimen: poistaa erikoismerkit, välilyönnit, alaviivat ja PI STEET"""
-    if not name: 
-        return ""
-    n = unicodedata.normalize('NFKD', str(name)).encode('ASCII', 'ignore').decode('utf-8')
-    # Poista VÄLILYÖNIT, ALAVIIVAT ja PISTEET
-    return n.lower().strip().replace(" ", "").replace("_", "").replace(".", "")
+def get_snapshot_store():
+    if SCORE_STORE == "firestore":
+        db = get_db()
+        if db:
+            return FirestoreSnapshotStore(db)
+        logging.warning("SCORE_STORE=firestore but Firebase is not configured, using file store")
+    if SCORE_STORE == "sqlite":
+        return SQLiteSnapshotStore()
+    return FileSnapshotStore()
 
-def create_short_key(first_name, last_name):
-    """
-    Luo lyhennetty avain API:n mukaan: eka kirjain + sukunimi (EI pistettä!)
-    Esimerkki: "Tomas", "Hertl" → "thertl"
-    """
-    if not first_name or not last_name:
-        return ""
-    first_initial = first_name[0].lower()
-    last_clean = clean_name(last_name)
-    return f"{first_initial}{last_clean}"  # EI pistettä väliin!
+@st.cache_resource
+def get_score_poller():
+    """Yksi taustapoller per prosessi; sivut lukevat vain sen viimeisintä snapshotia"""
+    return ScorePoller(plan=lambda: plan_next_poll(not_before=OLYMPICS_START), store=get_snapshot_store()).start()
 
-@st.cache_data(ttl=60)
-def fetch_live_scoring_by_name():
-    start_date = "2025-02-12"
-    end_date = "2025-02-20"
-    live_stats = {}
-    
-    dates = pd.date_range(start=start_date, end=end_date).strftime('%Y-%m-%d')
-    
-    for date_str in dates:
-        if date_str > datetime.now().strftime('%Y-%m-%d'):
-            continue
-            
-        try:
-            schedule_url = f"https://api-web.nhle.com/v1/schedule/{date_str}"
-            r = requests.get(schedule_url, timeout=5).json()
-            
-            game_week = r.get('gameWeek', [])
-            day_data = next((d for d in game_week if d.get('date') == date_str), None)
-            
-            if not day_data:
-                continue
-            
-            games = day_data.get('games', [])
-            
-            for game in games:
-                game_id = game.get('id')
-                game_type = game.get('gameType')
-                away_abbr = game.get('awayTeam', {}).get('abbrev')
-                home_abbr = game.get('homeTeam', {}).get('abbrev')
-                
-                if game_type in [9, 19]:
-                    box_url = f"https://api-web.nhle.com/v1/gamecenter/{game_id}/boxscore"
-                    
-                    try:
-                        box = requests.get(box_url, timeout=5).json()
-                        
-                        for team_type, country_code in [('awayTeam', away_abbr), ('homeTeam', home_abbr)]:
-                            team_stats = box.get('playerByGameStats', {}).get(team_type, {})
-                            
-                            for group in ['forwards', 'defense', 'goalies']:
-                                players = team_stats.get(group, [])
-                                
-                                for p in players:
-                                    # Käytä lyhennettyä nimeä API:sta (esim. "T. Konecny")
-                                    name_default = p.get('name', {}).get('default', '')
-                                    
-                                    if name_default:
-                                        # Muunna "T. Konecny" → "tkonecny" (poista piste!)
-                                        key = f"{clean_name(name_default)}_{clean_name(country_code)}"
-                                    else:
-                                        # Fallback
-                                        fn = p.get('firstName', {}).get('default', '')
-                                        ln = p.get('lastName', {}).get('default', '')
-                                        key = create_short_key(fn, ln) + f"_{clean_name(country_code)}"
-                                    
-                                    goals = int(p.get('goals', 0))
-                                    assists = int(p.get('assists', 0))
-                                    
-                                    if key not in live_stats:
-                                        live_stats[key] = {'goals': 0, 'assists': 0}
-                                    
-                                    live_stats[key]['goals'] += goals
-                                    live_stats[key]['assists'] += assists
-                                    
-                    except Exception:
-                        continue
-                        
-        except Exception:
-            continue
-    
-    return live_stats
-
-@st.cache_data(ttl=60)
-def get_all_players_data():
-    try:
-        df = pd.read_csv("olympic_players.csv")
-        base_roster = df.to_dict('records')
-        csv_loaded = True
-    except Exception as e:
-        base_roster = [...]  # fallback
-        csv_loaded = False
-
-    live_scores = fetch_live_scoring_by_name()
-    api_keys = list(live_scores.keys())
-    
-    matched_players = 0
-    total_points = 0
-    sample_matches = []
-    debug_comparison = []
-    
-    final_list = []
-    for player in base_roster:
-        f_name = str(player['firstName'])
-        l_name = str(player['lastName'])
-        country = str(player['teamName'])
-        pos = str(player['position'])
-        
-        # Yritä täsmätä lyhennetyllä avaimella ILMAN pistettä
-        short_key = create_short_key(f_name, l_name) + f"_{clean_name(country)}"
-        
-        # Hae stats
-        stats = live_scores.get(short_key, {'goals': 0, 'assists': 0})
-        
-        # Debug
-        if len(debug_comparison) < 10:
-            debug_comparison.append({
-                'name': f"{f_name} {l_name}",
-                'country': country,
-                'short_key': short_key,
-                'found': stats['goals'] > 0 or stats['assists'] > 0,
-                'stats': stats
-            })
-        
-        if stats['goals'] > 0 or stats['assists'] > 0:
-            matched_players += 1
-            total_points += stats['goals'] + stats['assists']
-            if len(sample_matches) < 5:
-                sample_matches.append(f"{f_name} {l_name} ({country}): {stats['goals']}G {stats['assists']}A")
-        
-        final_list.append({
-            "playerId": short_key,
-            "firstName": {"default": f_name},
-            "lastName": {"default": l_name},
-            "teamName": {"default": country},
-            "position": pos,
-            "goals": stats['goals'],
-            "assists": stats['assists'],
-            "points": stats['goals'] + stats['assists']
-        })
-    
-    st.session_state['player_data_debug'] = {
-        "csv_loaded": csv_loaded,
-        "csv_players": len(base_roster),
-        "api_players_with_stats": len(live_scores),
-        "matched_in_roster": matched_players,
-        "total_points": total_points,
-        "api_sample_keys": api_keys[:10],
-        "debug_comparison": debug_comparison,
-        "sample_matches": sample_matches
-    }
-    
-    return final_list
+@st.cache_resource(max_entries=2)
+def get_player_table(snapshot_version, _live_scores):
+    # Avaimena snapshotin versio: taulu rakennetaan kerran per pistemuutos ja jaetaan kaikille
+    # sessioille sellaisenaan (cache_data kopioisi sen jokaiselle rerunille)
+    return build_player_table(snapshot_version, _live_scores)
 
 def hash_pin(pin):
     return hashlib.sha256(pin.encode()).hexdigest()
 
-def calculate_points(player):
-    return player.get("points", 0)
-
 # --- DATABASE FUNCTIONS ---
 def save_team(team_name, pin, player_ids, manager_country):
     db = get_db()
@@ -269,84 +133,115 @@ def save_team(team_name, pin, player_ids, manager_country):
         if hash_pin(pin) != old_data.get("pin_hash"):
             return False, "Wrong PIN code!"
     
-    team_ref.set({
+    team_data = {
         "team_name": team_name,
         "pin_hash": hash_pin(pin),
         "player_ids": player_ids,
         "manager_country": manager_country,
         "created_at": datetime.now(),
         "updated_at": datetime.now()
-    })
+    }
+    team_ref.set(team_data)
+    get_team_repository().put(team_name, team_data)
     return True, "Team saved successfully!"
 
+@st.cache_resource
+def get_team_repository():
+    """Yksi joukkuevälimuisti per prosessi; pysyy ajan tasalla Firestore-kuuntelijalla"""
+    db = get_db()
+    if not db:
+        return None
+    return TeamRepository(db).start()
+
 def get_all_teams():
+    repo = get_team_repository()
+    if not repo: return []
+    return repo.all()
+
+def get_versioned_teams():
+    repo = get_team_repository()
+    if not repo: return 0, []
+    return repo.versioned()
+
+def get_team(team_name):
+    repo = get_team_repository()
+    if not repo: return None
+    return repo.get(team_name)
+
+def update_team_players(team_name, player_ids):
     db = get_db()
-    if not db: return []
-    
-    teams = []
-    for doc in db.collection("teams").stream():
-        data = doc.to_dict()
-        data["id"] = doc.id
-        teams.append(data)
-    return teams
+    db.collection("teams").document(team_name).update({
+        'player_ids': player_ids,
+        'updated_at': datetime.now()
+    })
+    get_team_repository().patch(team_name, {'player_ids': player_ids})
+
+def delete_team(team_name):
+    db = get_db()
+    db.collection("teams").document(team_name).delete()
+    get_team_repository().remove(team_name)
+
+@st.cache_resource(max_entries=2)
+def _cached_lineups(teams_key, _players, _teams):
+    # Kokoonpanot muuttuvat vain joukkueiden mukana; uusi maali käyttää samaa matriisia
+    return LineupMatrix([p['playerId'] for p in _players], _teams)
+
+@st.cache_resource(max_entries=4)
+def _cached_score_index(snapshot_version, teams_key, _players, _teams):
+    # Avaimena snapshotin ja joukkuevälimuistin versiot: lasketaan uudelleen vain kun jompikumpi muuttuu
+    lineups = _cached_lineups(teams_key, _players, _teams)
+    return build_score_index(_players, _teams, ALL_COUNTRIES, get_country_display, lineups)
+
+def get_score_index():
+    teams_version, teams = get_versioned_teams()
+    return _cached_score_index(SCORE_SNAPSHOT.version, teams_version, PLAYERS_DATA, teams)
+
+def preview_scoring(rules):
+    """Joukkueiden pisteet toisilla pisteytyssäännöillä (Adminin what-if); ei muuta mitään"""
+    players = PLAYER_TABLE.frame
+    points = score_points(players, rules)
+    teams_version, teams = get_versioned_teams()
+    lineups = _cached_lineups(teams_version, PLAYERS_DATA, teams)
+    totals = lineups.team_totals(lineups.points_vector(dict(zip(players["playerId"], points.tolist()))))
+    return dict(zip(lineups.team_names, totals.tolist()))
 
 def get_country_leaderboard():
-    teams = get_all_teams()
-    player_map = {p['playerId']: p for p in PLAYERS_DATA}
-    
-    country_points = defaultdict(list)
-    
-    for team in teams:
-        manager_country = team.get("manager_country", "OTHERS")
-        total = 0
-        for pid in team.get('player_ids', []):
-            if pid in player_map:
-                total += player_map[pid]['points']
-        country_points[manager_country].append(total)
-    
-    final_stats = defaultdict(lambda: {"points": [], "managers": 0, "countries": []})
-    
-    for country, points_list in country_points.items():
-        if len(points_list) < 3:
-            final_stats["OTHERS"]["points"].extend(points_list)
-            final_stats["OTHERS"]["managers"] += len(points_list)
-            final_stats["OTHERS"]["countries"].append(country)
-        else:
-            final_stats[country]["points"] = points_list
-            final_stats[country]["managers"] = len(points_list)
-            final_stats[country]["countries"] = [country]
-    
-    results = []
-    for group_code, data in final_stats.items():
-        if data["managers"] > 0:
-            avg = sum(data["points"]) / len(data["points"]) if data["points"] else 0
-            results.append({
-                "code": group_code,
-                "name": "Others" if group_code == "OTHERS" else ALL_COUNTRIES.get(group_code, group_code),
-                "managers": data["managers"],
-                "countries": data["countries"],
-                "avg_points": round(avg, 1),
-                "total_points": sum(data["points"]),
-                "best_score": max(data["points"]) if data["points"] else 0
-            })
-    
-    results.sort(key=lambda x: x["avg_points"], reverse=True)
-    return results
+    return get_score_index().country_leaderboard
 
 # --- REFRESH UTILITIES ---
 def clear_all_cache():
     try:
-        fetch_live_scoring_by_name.clear()
-        get_all_players_data.clear()
+        # Haku tehdään taustalla; sivu näyttää siihen asti edellisen snapshotin
+        get_score_poller().request_refresh()
+        get_player_table.clear()
+        repo = get_team_repository()
+        if repo:
+            repo.invalidate()
         return True
     except Exception as e:
         st.error(f"Error clearing cache: {e}")
         return False
 
+def show_snapshot_age():
+    """Kertoo, kuinka vanhoja näytetyt pisteet ovat; varoittaa, jos NHL API ei vastaa"""
+    age = snapshot_age(SCORE_SNAPSHOT)
+    if age is None:
+        st.caption("⏳ Waiting for the first scores from the NHL API...")
+    elif get_score_poller().last_error or get_client().breaker.state != "closed":
+        st.warning(f"⚠️ NHL API is not responding. Showing scores from {int(age // 60)} min ago.")
+    elif not SCORE_SNAPSHOT.complete:
+        st.warning("⚠️ Some games or schedule weeks could not be fetched. Scores may be missing recent games.")
+    elif age < 120:
+        st.caption(f"Scores updated {int(age)}s ago")
+    else:
+        st.caption(f"Scores updated {int(age // 60)} min ago")
+
 # --- UI ---
 st.title("🏒 Olympics Fantasy Hockey 2026")
 
-PLAYERS_DATA = get_all_players_data()
+SCORE_SNAPSHOT = get_score_poller().latest(timeout=FIRST_SNAPSHOT_TIMEOUT)
+PLAYER_TABLE = get_player_table(SCORE_SNAPSHOT.version, SCORE_SNAPSHOT.live_stats)
+PLAYERS_DATA = PLAYER_TABLE.records
 
 # --- SIDEBAR ---
 with st.sidebar:
@@ -377,6 +272,7 @@ if page == "🏠 Home":
             st.metric("🗓️ Tournament Starts", "Feb 11, 2026")
     else:
         st.success("🏒 **Olympics are LIVE!** Tournament in progress!")
+        show_snapshot_age()
     
     st.markdown("---")
     
@@ -387,27 +283,18 @@ if page == "🏠 Home":
     if total_teams > 0:
         st.markdown("### 📊 Live Tournament Stats")
         
-        # Calculate stats
-        player_map = {p['playerId']: p for p in PLAYERS_DATA}
-        total_points = 0
-        country_participation = defaultdict(int)
+        # Valmiiksi laskettu indeksi: ei pelaajakohtaista summausta joka renderöinnillä
+        index = get_score_index()
+        total_points = index.total_points
+        country_participation = index.country_participation
         
-        for team in teams:
-            country_participation[team.get('manager_country', 'UNK')] += 1
-            for pid in team.get('player_ids', []):
-                if pid in player_map:
-                    total_points += player_map[pid]['points']
-        
-        # Top stats
-        if teams:
-            team_points = []
-            for team in teams:
-                pts = sum(player_map.get(pid, {}).get('points', 0) for pid in team.get('player_ids', []))
-                team_points.append((team['team_name'], pts, team.get('manager_country', 'UNK')))
-            team_points.sort(key=lambda x: x[1], reverse=True)
-            
-            top_team = team_points[0] if team_points else None
-            avg_points = total_points / total_teams if total_teams > 0 else 0
+        top3 = index.leaderboard.head(3)
+        team_points = [
+            (name, pts, index.teams_by_name[name].get('manager_country', 'UNK'))
+            for name, pts in zip(top3["Team"], top3["Points"])
+        ]
+        top_team = team_points[0] if team_points else None
+        avg_points = total_points / total_teams if total_teams > 0 else 0
         
         col1, col2, col3, col4 = st.columns(4)
         
@@ -425,7 +312,7 @@ if page == "🏠 Home":
                 st.metric("🏆 Current Leader", top_team[0][:10] + "..." if len(top_team[0]) > 10 else top_team[0])
         
         # Top 3 preview
-        if len(team_points) >= 3:
+        if total_teams >= 3:
             st.markdown("---")
             st.markdown("### 🏆 Top 3 Teams")
             
@@ -450,14 +337,14 @@ if page == "🏠 Home":
     
     with col_right:
         st.markdown("### 📊 Scoring")
-        st.markdown("""
-        | Action | Points |
-        |--------|--------|
-        | ⚽ Goal | **1 point** |
-        | 🎯 Assist | **1 point** |
-        
-        *Simple and exciting!*
-        """)
+        # Taulukko config.SCORINGista, jotta näytetyt säännöt vastaavat laskettuja pisteitä.
+        # Vain F/D-kokoonpanon ansaittavissa olevat säännöt; maalivahteja ei voi valita
+        rule_icons = {"goal": "⚽", "assist": "🎯"}
+        scoring_rows = "\n".join(
+            f"| {rule_icons.get(rule, '🏒')} {rule.capitalize()} | **{weight} point{'s' if weight != 1 else ''}** |"
+            for rule, weight in lineup_rules().items()
+        )
+        st.markdown("| Action | Points |\n|--------|--------|\n" + scoring_rows)
     
     st.markdown("---")
     
@@ -644,14 +531,11 @@ elif page == "👤 My Team":
             submit = st.form_submit_button("🔓 Log In")
         
         if submit:
-            target_team = None
-            for t in get_all_teams():
-                if t['team_name'] == login_name:
-                    target_team = t
-                    break
+            target_team = get_team(login_name)
             
             if target_team and hash_pin(login_pin) == target_team['pin_hash']:
-                st.session_state['logged_in_team'] = target_team
+                # Kopio: välimuistin joukkueita ei muokata session kautta
+                st.session_state['logged_in_team'] = dict(target_team)
                 st.rerun()
             else:
                 st.error("Invalid Team Name or PIN")
@@ -697,7 +581,7 @@ elif page == "👤 My Team":
                     db = get_db()
                     if db:
                         try:
-                            db.collection("teams").document(target_team['team_name']).delete()
+                            delete_team(target_team['team_name'])
                             st.success(f"Team '{target_team['team_name']}' deleted successfully!")
                             st.session_state['logged_in_team'] = None
                             st.session_state['show_delete_confirm'] = False
@@ -724,7 +608,7 @@ elif page == "👤 My Team":
                 st.session_state['edit_temp_selections'] = {}
                 # Pre-select current players
                 current_players = target_team.get('player_ids', [])
-                player_map_temp = {p['playerId']: p for p in PLAYERS_DATA}
+                player_map_temp = PLAYER_TABLE.by_id
                 for pid in current_players:
                     if pid in player_map_temp:
                         p = player_map_temp[pid]
@@ -830,7 +714,7 @@ elif page == "👤 My Team":
             # Validation
             stats_counts = {'F': 0, 'D': 0, 'total': 0}
             countries_selected = set()
-            player_map = {p['playerId']: p for p in PLAYERS_DATA}
+            player_map = PLAYER_TABLE.by_id
             
             for pid in selected_player_ids:
                 p = player_map[pid]
@@ -876,9 +760,7 @@ elif page == "👤 My Team":
                         db = get_db()
                         if db:
                             try:
-                                db.collection("teams").document(target_team['team_name']).update({
-                                    'player_ids': selected_player_ids
-                                })
+                                update_team_players(target_team['team_name'], selected_player_ids)
                                 st.session_state['logged_in_team']['player_ids'] = selected_player_ids
                                 st.session_state['editing_team'] = False
                                 st.session_state['edit_temp_selections'] = {}
@@ -900,7 +782,7 @@ elif page == "👤 My Team":
         
         # SHOW CURRENT ROSTER
         if st.session_state['logged_in_team']:
-            player_map = {p['playerId']: p for p in PLAYERS_DATA}
+            player_map = PLAYER_TABLE.by_id
             
             team_roster = []
             total_pts = 0
@@ -1107,7 +989,7 @@ elif page == "✏️ Create Team":
     # Reaaliaikainen validointi
     stats_counts = {'F': 0, 'D': 0, 'total': 0}
     countries_selected = set()
-    player_map = {p['playerId']: p for p in PLAYERS_DATA}
+    player_map = PLAYER_TABLE.by_id
     
     for pid in selected_player_ids:
         p = player_map[pid]
@@ -1194,39 +1076,18 @@ elif page == "🏆 Leaderboard":
     col1, col2 = st.columns([3, 1])
     with col2:
         if st.button("🔄 Refresh Data", type="secondary", help="Force refresh from NHL API"):
-            fetch_live_scoring_by_name.clear()
-            get_all_players_data.clear()
+            clear_all_cache()
             st.success("Cache cleared! Reloading...")
             st.rerun()
+    with col1:
+        show_snapshot_age()
     
-    all_teams = get_all_teams()
-    player_map = {p['playerId']: p for p in PLAYERS_DATA}
-    
-    rankings = []
-    teams_dict = {}
-    
-    for team in all_teams:
-        t_points = 0
-        for pid in team.get('player_ids', []):
-            if pid in player_map:
-                t_points += player_map[pid]['points']
-        
-        manager_country = team.get("manager_country", "UNK")
-        team_name = team['team_name']
-        
-        rankings.append({
-            "Team": team_name,
-            "Manager": get_country_display(manager_country),
-            "Points": t_points
-        })
-        
-        teams_dict[team_name] = team
-    
-    df = pd.DataFrame(rankings).sort_values("Points", ascending=False).reset_index(drop=True)
-    df.index += 1
+    index = get_score_index()
+    player_map = index.player_map
+    teams_dict = index.teams_by_name
     
     st.dataframe(
-        df,
+        index.leaderboard,
         use_container_width=True,
         column_config={
             "Team": st.column_config.TextColumn("Team", width="medium"),
@@ -1238,13 +1099,13 @@ elif page == "🏆 Leaderboard":
     st.divider()
     st.subheader("👥 View Team Roster")
     
-    if rankings:
-        team_names = [r["Team"] for r in sorted(rankings, key=lambda x: x["Points"], reverse=True)]
+    if teams_dict:
+        team_names = index.leaderboard["Team"].tolist()
         
         selected_team = st.selectbox(
             "Select a team to view their roster:",
             options=team_names,
-            format_func=lambda x: f"{x} ({next(r['Points'] for r in rankings if r['Team'] == x)} pts)"
+            format_func=lambda x: f"{x} ({index.team_points[x]} pts)"
         )
         
         if selected_team:
@@ -1290,6 +1151,14 @@ elif page == "🏆 Leaderboard":
             col1.metric("Total Points", total_pts)
             col2.metric("Forwards", len([r for r in team_roster if r['Pos'] in ['C', 'L', 'R', 'F']]))  # Pitäisi olla 8
             col3.metric("Defensemen", len([r for r in team_roster if r['Pos'] == 'D']))  # Pitäisi olla 4
+
+            if SCORE_SNAPSHOT.box_rows is not None:
+                with st.expander("📋 Game-by-Game", expanded=False):
+                    log = game_log(PLAYER_TABLE.frame, SCORE_SNAPSHOT.box_rows, team_data.get('player_ids', []))
+                    if log.empty:
+                        st.info("No games played by this roster yet")
+                    else:
+                        st.dataframe(log, use_container_width=True, hide_index=True)
     else:
         st.info("No teams registered yet!")
 
@@ -1322,54 +1191,131 @@ elif page == "⚙️ Admin":
             if st.button("🔄 Reload Page", use_container_width=True, type="secondary"):
                 st.rerun()
         
+        poller = get_score_poller()
+        snapshot = poller.latest()
+        fetched = snapshot.fetched_at.strftime('%H:%M:%S') if snapshot.fetched_at else "never"
+        warm = " (warm start from disk)" if poller.warm_started else ""
+        st.caption(f"Score snapshot v{snapshot.version} fetched at {fetched}{warm}")
+        st.caption(f"Snapshot store: {SCORE_STORE}, this process is the {poller.role} ({poller.owner})")
+        plan = poller.plan
+        interval = "on demand only" if plan.interval is None else f"every {int(plan.interval)}s"
+        next_poll = poller.next_poll_at.strftime('%d.%m. %H:%M:%S') if poller.next_poll_at else "-"
+        st.caption(f"Polling {interval} ({plan.reason}), next poll at {next_poll}")
+        flights = poller.flight_stats()
+        st.caption(
+            f"Refreshes: {flights['fetches']} fetches, {flights['coalesced']} coalesced, "
+            f"{flights['duplicates']} duplicate, {flights['game_retries']} failed-game retries"
+        )
+        if not snapshot.complete:
+            st.warning(
+                f"Snapshot incomplete: {len(snapshot.failed_games)}/{snapshot.games} games failed "
+                f"({', '.join(map(str, snapshot.failed_games))}), "
+                f"{snapshot.schedule_failures} schedule weeks failed. Retrying failed games only."
+            )
+        if poller.last_error:
+            st.warning(f"Last background refresh failed: {poller.last_error}")
+        
         # Debug Information
         st.divider()
         st.subheader("🔍 Debug Information")
         
         with st.expander("📊 Player Data Debug", expanded=False):
-            if 'player_data_debug' in st.session_state:
-                d = st.session_state['player_data_debug']
-                
-                # Summary metrics
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    st.metric("CSV Players", d.get('csv_players', 0))
-                with col2:
-                    st.metric("API Players", d.get('api_players_with_stats', 0))
-                with col3:
-                    st.metric("Matched", d.get('matched_in_roster', 0))
-                with col4:
-                    st.metric("Total Points", d.get('total_points', 0))
-                
+            d = PLAYER_TABLE.debug
+            st.caption(
+                f"Player table v{PLAYER_TABLE.version}: {len(PLAYER_TABLE.records)} players, "
+                f"built in {PLAYER_TABLE.build_ms:.1f} ms, shared by all sessions"
+            )
+            
+            # Summary metrics
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("CSV Players", d.get('csv_players', 0))
+            with col2:
+                st.metric("API Players", d.get('api_players_with_stats', 0))
+            with col3:
+                st.metric("Matched", d.get('matched_in_roster', 0))
+            with col4:
+                st.metric("Total Points", d.get('total_points', 0))
+            
+            st.caption(f"Roster rows joined by name key (no NHL id): {d.get('name_fallback_rows', 0)}")
+            st.divider()
+            
+            # API Sample Keys
+            st.markdown("**API Sample Keys (first 10):**")
+            for key in d.get('api_sample_keys', [])[:10]:
+                st.code(key, language=None)
+            
+            # Key Comparison
+            if d.get('debug_comparison'):
                 st.divider()
-                
-                # API Sample Keys
-                st.markdown("**API Sample Keys (first 10):**")
-                for key in d.get('api_sample_keys', [])[:10]:
-                    st.code(key, language=None)
-                
-                # Key Comparison
-                if d.get('debug_comparison'):
-                    st.divider()
-                    st.markdown("**Key Comparison:**")
-                    for comp in d['debug_comparison'][:5]:
-                        status = "✅" if comp.get('found') else "❌"
-                        st.text(f"{status} {comp.get('name')} ({comp.get('country')})")
-                        st.text(f"   Short Key: {comp.get('short_key')}")
-                        if comp.get('found'):
-                            st.text(f"   Stats: {comp.get('stats', {})}")
-                
-                # Matches with Points
-                if d.get('sample_matches'):
-                    st.divider()
-                    st.markdown("**🌟 Matches with Points:**")
-                    for match in d['sample_matches']:
-                        st.text(match)
-                else:
-                    st.warning("No matches found!")
+                st.markdown("**Key Comparison:**")
+                for comp in d['debug_comparison'][:5]:
+                    status = "✅" if comp.get('found') else "❌"
+                    st.text(f"{status} {comp.get('name')} ({comp.get('country')})")
+                    st.text(f"   Short Key: {comp.get('short_key')}")
+                    st.text(f"   NHL ID: {comp.get('nhl_id') or '-'}")
+                    if comp.get('found'):
+                        st.text(f"   Stats: {comp.get('stats', {})}")
+            
+            # Matches with Points
+            if d.get('sample_matches'):
+                st.divider()
+                st.markdown("**🌟 Matches with Points:**")
+                for match in d['sample_matches']:
+                    st.text(match)
             else:
-                st.info("No debug data available. Click 'Force Refresh Data' to load.")
-        
+                st.warning("No matches found!")
+
+        with st.expander("📡 NHL API Latency", expanded=False):
+            st.caption(f"Finished games cached (never refetched): {game_cache.final_count()}")
+            cond = get_client().conditional_stats()
+            st.caption(f"Conditional GET: {cond['hits']} hits (304) / {cond['misses']} misses, {cond['cached_urls']} URLs with validators")
+            breaker = get_client().breaker.status()
+            st.caption(
+                f"Circuit breaker: {breaker['state']} ({breaker['failures']} consecutive failures, "
+                f"opened {breaker['opened']}x, next probe in {breaker['retry_in']}s)"
+            )
+            latency = get_client().latency_stats()
+            if latency:
+                latency_rows = [{"Endpoint": label, **s} for label, s in latency.items()]
+                st.dataframe(pd.DataFrame(latency_rows), use_container_width=True, hide_index=True)
+                if st.button("♻️ Reset Counters", key="reset_latency_btn"):
+                    get_client().reset_stats()
+                    st.rerun()
+            else:
+                st.info("No NHL API requests made by this process yet.")
+
+        with st.expander("🧮 Scoring Rules What-If", expanded=False):
+            st.caption(
+                "Current rules: " + ", ".join(f"{rule} {weight}" for rule, weight in SCORING.items())
+                + f". Goalie rules ({', '.join(GOALIE_RULES)}) can't change team totals: lineups are forwards and defensemen only."
+            )
+            editable = lineup_rules()
+            rule_cols = st.columns(len(editable))
+            rules = dict(SCORING)
+            rules.update({
+                rule: col.number_input(rule.capitalize(), value=weight, step=1, key=f"whatif_{rule}")
+                for (rule, weight), col in zip(editable.items(), rule_cols)
+            })
+            started = time.perf_counter()
+            preview = preview_scoring(rules)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            index = get_score_index()
+            if preview:
+                whatif = pd.DataFrame({
+                    "Team": list(preview),
+                    "Rank": [index.team_ranks.get(name) for name in preview],
+                    "Points": [index.team_points.get(name, 0) for name in preview],
+                    "What-if": list(preview.values()),
+                })
+                whatif["Δ"] = whatif["What-if"] - whatif["Points"]
+                whatif = whatif.sort_values("What-if", ascending=False, kind="stable").reset_index(drop=True)
+                whatif.insert(1, "What-if Rank", whatif.index + 1)
+                st.dataframe(whatif.head(20), use_container_width=True, hide_index=True)
+            else:
+                st.info("No teams to score")
+            st.caption(f"Re-scored {len(PLAYERS_DATA)} players and {len(preview)} teams in {elapsed_ms:.1f} ms")
+
         # Team Management
         st.divider()
         st.subheader("👥 Team Management")
@@ -1377,6 +1323,10 @@ elif page == "⚙️ Admin":
         all_teams = get_all_teams()
         
         st.markdown(f"**Total Teams: {len(all_teams)}**")
+        repo = get_team_repository()
+        if repo:
+            sync_mode = "live listener" if repo.listening else f"reload every {repo.ttl}s"
+            st.caption(f"Teams cache v{repo.version} ({sync_mode}, {repo.full_reloads} full reloads)")
         
         if not all_teams:
             st.info("No teams found in database")
@@ -1413,7 +1363,7 @@ elif page == "⚙️ Admin":
                     db = get_db()
                     if db:
                         try:
-                            db.collection("teams").document(team_to_delete).delete()
+                            delete_team(team_to_delete)
                             st.success(f"✅ Team '{team_to_delete}' deleted successfully!")
                             st.balloons()
                             st.rerun()
@@ -4,7 +4,7 @@ import json
 from datetime import datetime
 import firebase_admin
 from firebase_admin import credentials, firestore
-import requests
+from nhl_client import get_client
 import pandas as pd
 import unicodedata
 from collections import defaultdict
@@ -106,8 +106,7 @@ def fetch_live_scoring_by_name():
             continue
             
         try:
-            schedule_url = f"https://api-web.nhle.com/v1/schedule/{date_str}"
-            r = requests.get(schedule_url, timeout=5).json()
+            r = get_client().get(f"schedule/{date_str}", timeout=5).json()
             
             game_week = r.get('gameWeek', [])
             day_data = next((d for d in game_week if d.get('date') == date_str), None)
@@ -124,10 +123,8 @@ def fetch_live_scoring_by_name():
                 home_abbr = game.get('homeTeam', {}).get('abbrev')
                 
                 if game_type in [9, 19]:
-                    box_url = f"https://api-web.nhle.com/v1/gamecenter/{game_id}/boxscore"
-                    
                     try:
-                        box = requests.get(box_url, timeout=5).json()
+                        box = get_client().get(f"gamecenter/{game_id}/boxscore", timeout=5).json()
                         
                         for team_type, country_code in [('awayTeam', away_abbr), ('homeTeam', home_abbr)]:
                             team_stats = box.get('playerByGameStats', {}).get(team_type, {})
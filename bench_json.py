@@ -0,0 +1,104 @@
+"""
+Boxscoren dekoodaus: json vs. orjson, koko vastaus vs. select_boxscore-karsinta.
+Mittaa jäsennysajan ja muistin (tracemalloc: huippu ja jäljelle jäävä) per peli.
+get_json karsii vain vastaukset, jotka jäävät _validators-välimuistiin; "selected"-rivien
+lisäaika on siis hinta, jolla "kept"-muisti pienenee.
+
+    python bench_json.py --record boxscores     # tallentaa turnauksen boxscoret levylle
+    python bench_json.py boxscores              # mittaa tallennetuilla vastauksilla
+"""
+import argparse
+import glob
+import json
+import os
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from live_scoring import (
+    END_DATE, MAX_WORKERS, START_DATE, ScheduleCatalog, parse_boxscore, select_boxscore,
+)
+from nhl_client import MAX_RETRIES, REQUEST_TIMEOUT, get_client, orjson
+
+
+def record(directory):
+    """Hakee päättyneiden pelien boxscoret ja tallentaa raakatavut sellaisenaan"""
+    client = get_client()
+    catalog = ScheduleCatalog(path=None)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        catalog.refresh(client, START_DATE, END_DATE, datetime.now().date(),
+                        pool, REQUEST_TIMEOUT, MAX_RETRIES)
+    os.makedirs(directory, exist_ok=True)
+    saved = 0
+    for game in catalog.all_games():
+        r = client.get(f"gamecenter/{game['id']}/boxscore")
+        if r.status_code != 200:
+            continue
+        with open(os.path.join(directory, f"{game['id']}.json"), "wb") as f:
+            f.write(r.content)
+        saved += 1
+    print(f"saved {saved} boxscores to {directory}")
+
+
+def decode_all(payloads, loads, select):
+    # Kuten get_jsonissa: karsinta heti kunkin pelin dekoodauksen jälkeen
+    if select is None:
+        return [loads(raw) for raw in payloads]
+    return [select(loads(raw)) for raw in payloads]
+
+
+def measure(payloads, loads, select, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        decode_all(payloads, loads, select)
+        best = min(best, time.perf_counter() - started)
+    tracemalloc.start()
+    # Jäljelle jäävä muisti = mitä välimuisti (_validators) pitää hallussaan pelien välillä
+    kept = decode_all(payloads, loads, select)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return best, peak, retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark boxscore JSON decoding")
+    parser.add_argument("directory", nargs="?", default="boxscores", help="directory of recorded <gameId>.json")
+    parser.add_argument("--record", action="store_true", help="fetch boxscores from the NHL API first")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.directory)
+    paths = sorted(glob.glob(os.path.join(args.directory, "*.json")))
+    if not paths:
+        parser.error(f"no recorded boxscores in {args.directory}; run with --record first")
+    payloads = []
+    for path in paths:
+        with open(path, "rb") as f:
+            payloads.append(f.read())
+    size_kb = sum(map(len, payloads)) / len(payloads) / 1024
+    print(f"{len(payloads)} boxscores, avg {size_kb:.1f} KB")
+
+    backends = {"json": json.loads}
+    if orjson is not None:
+        backends["orjson"] = orjson.loads
+    print(f"{'backend':8} {'fields':8} {'ms/game':>9} {'peak KB/game':>13} {'kept KB/game':>13}")
+    for name, loads in backends.items():
+        for label, select in [("full", None), ("selected", select_boxscore)]:
+            best, peak, retained = measure(payloads, loads, select, args.repeat)
+            n = len(payloads)
+            print(f"{name:8} {label:8} {best * 1000 / n:9.3f} {peak / 1024 / n:13.1f} {retained / 1024 / n:13.1f}")
+
+    # Karsinta ei saa muuttaa pisteitä: verrataan parse_boxscoren tuloksia
+    for path, raw in zip(paths, payloads):
+        game_id = int(os.path.splitext(os.path.basename(path))[0])
+        full = parse_boxscore(json.loads(raw), game_id, "AWY", "HOM")
+        selected = parse_boxscore(select_boxscore(json.loads(raw)), game_id, "AWY", "HOM")
+        assert full.equals(selected), f"select_boxscore changed stats for game {game_id}"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Pelaajataulun hinta per rerun ja per sessio: st.cache_data (pickle-kopio + uusi
+player_records-lista joka rerunilla) vs. st.cache_resource (yksi jaettu PlayerTable).
+
+    python bench_players.py --sessions 50
+"""
+import argparse
+import pickle
+import random
+import time
+import tracemalloc
+
+from players_table import build_player_table, build_players_frame, load_roster_table, player_records
+
+
+def synthetic_stats(roster, seed=1):
+    rng = random.Random(seed)
+    stats = {}
+    for pid in roster["playerId"].sample(frac=0.5, random_state=seed):
+        stats[pid] = {"name_key": pid, "goals": rng.randint(0, 4), "assists": rng.randint(0, 5),
+                      "wins": 0, "shutouts": 0}
+    return stats
+
+
+def copied_rerun(pickled):
+    """Vanha polku: cache_data palauttaa kopion DataFramesta, josta tehdään uudet dictit"""
+    return player_records(pickle.loads(pickled))
+
+
+def shared_rerun(table):
+    """Uusi polku: cache_resource palauttaa saman olion; rerun vain lukee sen kentät"""
+    return table.records
+
+
+def per_rerun_ms(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def retained_kb(fn, sessions):
+    """Muisti, joka jää, kun jokainen sessio pitää oman rerun-tuloksensa (PLAYERS_DATA)"""
+    tracemalloc.start()
+    kept = [fn() for _ in range(sessions)]
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return retained / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-rerun player data copies vs a shared table")
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    roster, _ = load_roster_table()
+    live_stats = synthetic_stats(roster)
+    pickled = pickle.dumps(build_players_frame(roster, live_stats))
+    table = build_player_table(1, live_stats)
+    print(f"{len(table.records)} players, table built once in {table.build_ms:.1f} ms")
+
+    for label, fn in [("cache_data copy", lambda: copied_rerun(pickled)), ("shared table", lambda: shared_rerun(table))]:
+        ms = per_rerun_ms(fn, args.repeat)
+        kb = retained_kb(fn, args.sessions)
+        print(f"{label:16} {ms:8.3f} ms/rerun  {kb / args.sessions:8.1f} KB/session ({args.sessions} sessions)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Joukkueiden uudelleenpisteytys maalin jälkeen: Python-silmukka vs. LineupMatrix.
+
+    python bench_scoring.py --teams 100000
+"""
+import argparse
+import random
+import time
+
+from lineup_matrix import LineupMatrix
+from players_table import build_players_frame, load_roster_table, player_records
+
+
+# Sovellus hyväksyy vain 12 pelaajan kokoonpanot (8 hyökkääjää + 4 puolustajaa, yksi per maa)
+LINEUP_SIZE = 12
+
+
+def synthetic_teams(player_ids, count, size=LINEUP_SIZE, seed=1):
+    rng = random.Random(seed)
+    return [{"team_name": f"Team {i}", "player_ids": rng.sample(player_ids, size)} for i in range(count)]
+
+
+def loop_totals(teams, points_by_id):
+    """Vanha tapa: summa jokaisen joukkueen player_ids-listan yli"""
+    return [sum(points_by_id.get(pid, 0) for pid in team.get('player_ids', [])) for team in teams]
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark re-scoring all teams after a goal")
+    parser.add_argument("--teams", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    roster, _ = load_roster_table()
+    players = player_records(build_players_frame(roster, {}))
+    player_ids = [p['playerId'] for p in players]
+    rng = random.Random(2)
+    points_by_id = {pid: rng.randint(0, 8) for pid in player_ids}
+    teams = synthetic_teams(player_ids, args.teams)
+    print(f"{len(teams)} teams × {LINEUP_SIZE} players, {len(player_ids)} roster players")
+
+    build, lineups = best_of(lambda: LineupMatrix(player_ids, teams), 1)
+    print(f"build lineup matrix (once per team change): {build * 1000:9.1f} ms")
+
+    # Maali: yhden pelaajan pisteet muuttuvat, kaikkien joukkueiden summat lasketaan uudelleen
+    points_by_id[player_ids[0]] += 3
+    loop, expected = best_of(lambda: loop_totals(teams, points_by_id), args.repeat)
+    print(f"python loop re-score:                     {loop * 1000:9.1f} ms")
+    matrix, totals = best_of(lambda: lineups.team_totals(lineups.points_vector(points_by_id)), args.repeat)
+    print(f"matrix re-score (points vector + gather): {matrix * 1000:9.1f} ms")
+    print(f"speedup: {loop / matrix:.0f}x")
+    assert totals.tolist() == expected, "matrix totals differ from the loop"
+
+
+if __name__ == "__main__":
+    main()
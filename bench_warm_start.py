@@ -0,0 +1,85 @@
+"""
+Aika ensimmäiseen leaderboardiin prosessin käynnistyksestä: kylmä käynnistys (koko
+turnaus haetaan NHL API:sta) vs. lämmin käynnistys (snapshot luetaan levyltä).
+
+    python bench_warm_start.py --teams 500
+"""
+import argparse
+import functools
+import os
+import random
+import tempfile
+import time
+
+from bench_scoring import LINEUP_SIZE
+from live_scoring import GameCache, ScheduleCatalog, crawl_live_scoring, retry_failed_games
+from players_table import build_players_frame, load_roster_table, player_records
+from score_index import build_score_index
+from score_poller import ScorePoller
+from snapshot_store import FileSnapshotStore
+
+# Kuinka kauan kylmän ajon snapshotin tallennusta odotetaan ennen luovuttamista (s)
+SAVE_TIMEOUT = 10
+
+
+def synthetic_teams(players, count, size=LINEUP_SIZE, seed=1):
+    rng = random.Random(seed)
+    ids = [p['playerId'] for p in players]
+    return [
+        {"team_name": f"Team {i}", "manager_country": "FIN", "player_ids": rng.sample(ids, min(size, len(ids)))}
+        for i in range(count)
+    ]
+
+
+def time_to_first_leaderboard(store_path, team_count):
+    """Uusi poller tyhjillä välimuisteilla, kuten juuri käynnistetyssä prosessissa"""
+    cache = GameCache()
+    load_roster_table.cache_clear()
+    started = time.perf_counter()
+    catalog = ScheduleCatalog(path=None)
+    poller = ScorePoller(
+        fetch=functools.partial(crawl_live_scoring, cache=cache, catalog=catalog),
+        retry=functools.partial(retry_failed_games, cache=cache),
+        store=FileSnapshotStore(store_path),
+        cache=cache,
+        catalog=catalog,
+    ).start()
+    snapshot = poller.latest(timeout=120)
+    roster, _ = load_roster_table()
+    players = player_records(build_players_frame(roster, snapshot.live_stats))
+    index = build_score_index(players, synthetic_teams(players, team_count), {})
+    elapsed = time.perf_counter() - started
+    return elapsed, snapshot, index, poller
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark time-to-first-leaderboard, cold vs warm start")
+    parser.add_argument("--teams", type=int, default=200, help="synthetic teams in the leaderboard")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store_path = os.path.join(tmp, "score_snapshot.json")
+        cold, snapshot, index, cold_poller = time_to_first_leaderboard(store_path, args.teams)
+        if not snapshot.version:
+            # Kylmä haku epäonnistui (esim. katkaisija aukesi): tallennettavaa snapshotia ei tule
+            parser.exit(1, f"cold crawl published no snapshot: {cold_poller.last_error or 'no data'}\n")
+        print(f"cold start: {cold * 1000:8.1f} ms  ({snapshot.games} games, {len(snapshot.live_stats)} players)")
+        # Kylmän ajon poller tallentaa snapshotin; annetaan kirjoitukselle rajattu aika
+        deadline = time.monotonic() + SAVE_TIMEOUT
+        while not os.path.exists(store_path):
+            if time.monotonic() > deadline:
+                parser.exit(1, f"snapshot was not saved to {store_path} within {SAVE_TIMEOUT}s\n")
+            time.sleep(0.01)
+        warm, snapshot, warm_index, poller = time_to_first_leaderboard(store_path, args.teams)
+        print(f"warm start: {warm * 1000:8.1f} ms  ({snapshot.games} games, {len(snapshot.live_stats)} players)")
+        print(f"speedup:    {cold / warm:8.1f}x")
+        assert warm_index.team_points == index.team_points, "warm start leaderboard differs from cold start"
+
+        # Lämpimän käynnistyksen taustahaku: odotetaan sen valmistumista (single-flight)
+        started = time.perf_counter()
+        snapshot = poller.refresh()
+        print(f"background refresh caught up after another {(time.perf_counter() - started) * 1000:.1f} ms (v{snapshot.version})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Tarkistaa, että DataFrame-liitos (build_players_frame + player_records) antaa samat
+rivit kuin vanha rivi kerrallaan create_short_key-silmukka satunnaisilla tilastoilla,
+täsmäämättömällä avaimella ja tyhjillä tilastoilla. Lisäksi game_log: ID- ja
+nimiosumat sekä joukkue, jonka yksikään pelaaja ei ole pelannut.
+
+    python check_players_table.py --rounds 20
+"""
+import argparse
+import os
+import random
+import tempfile
+
+import pandas as pd
+
+from live_scoring import STAT_FIELDS, clean_name, create_short_key, parse_boxscore
+from players_table import GAME_LOG_COLUMNS, ROSTER_FILE, build_players_frame, game_log, load_roster, player_records
+from scoring_rules import RULE_STATS, SCORING
+
+
+def reference_records(path, live_stats, rules=SCORING):
+    """
+    Vanha app.py-silmukka: avain create_short_key + "_maa" jokaiselle CSV-riville.
+    Myöhemmin lisätty NHL-ID-polku on mukana: rivi, jolla on nhlId, haetaan ID:llä.
+    """
+    by_name = {}
+    for stats in live_stats.values():
+        total = by_name.setdefault(stats['name_key'], dict.fromkeys(STAT_FIELDS, 0))
+        for field in STAT_FIELDS:
+            total[field] += stats.get(field, 0)
+
+    records = []
+    for player in pd.read_csv(path, dtype=str, keep_default_na=False).to_dict('records'):
+        f_name = str(player['firstName'])
+        l_name = str(player['lastName'])
+        country = str(player['teamName'])
+        short_key = create_short_key(f_name, l_name) + f"_{clean_name(country)}"
+        # fetch_ids.py kirjoittaa NHL-ID:n playerId-sarakkeeseen
+        nhl_id = player.get('nhlId') or player.get('playerId', '')
+        stats = live_stats.get(int(nhl_id), {}) if nhl_id else by_name.get(short_key, {})
+        values = {field: stats.get(field, 0) for field in STAT_FIELDS}
+        records.append({
+            "playerId": short_key,
+            "firstName": {"default": f_name},
+            "lastName": {"default": l_name},
+            "teamName": {"default": country},
+            "position": str(player['position']),
+            **values,
+            "points": sum(weight * values[RULE_STATS[rule]] for rule, weight in rules.items()),
+        })
+    return records
+
+
+def random_stats(keys, rng, share=0.4):
+    """Satunnaiset tilastot osalle avaimista sekä yksi avain, jota rosterissa ei ole"""
+    live_stats = {
+        key: {"name_key": name_key, **{field: rng.randint(0, 3) for field in STAT_FIELDS}}
+        for key, name_key in keys if rng.random() < share
+    }
+    live_stats["xnobody_zzz"] = {"name_key": "xnobody_zzz", **dict.fromkeys(STAT_FIELDS, 2)}
+    return live_stats
+
+
+def check(path, live_stats):
+    roster, _ = load_roster(path)
+    actual = player_records(build_players_frame(roster, live_stats))
+    expected = reference_records(path, live_stats)
+    if len(actual) != len(expected):
+        raise AssertionError(f"{path}: {len(actual)} rows, expected {len(expected)}")
+    for i, (a, e) in enumerate(zip(actual, expected)):
+        if a != e:
+            raise AssertionError(f"{path}: row {i} differs: {a} != {e}")
+    return len(actual)
+
+
+def check_game_log(path):
+    """Yksi peli, jossa pelaa rosterin kaksi ensimmäistä pelaajaa ja yksi tuntematon"""
+    roster, _ = load_roster(path)
+    players = build_players_frame(roster, {})
+    picked = players.head(2)
+    skaters = [
+        {
+            # ID-rivi liittyy NHL-ID:llä, muut nimellä "E. Sukunimi" kuten API:ssa
+            "playerId": int(p.nhlId) if pd.notna(p.nhlId) else 9000000 + i,
+            "name": {"default": f"{p.firstName[0]}. {p.lastName}"},
+            "goals": 1, "assists": i, "toi": "12:05",
+        }
+        for i, p in enumerate(picked.itertuples())
+    ]
+    skaters.append({"playerId": 9999999, "name": {"default": "X. Nobody"}, "goals": 2, "toi": "1:00"})
+    # Jokainen pelaaja omana rivinään oman maansa joukkueessa
+    countries = picked["teamName"].tolist()
+    rows = pd.concat([
+        parse_boxscore({"playerByGameStats": {"awayTeam": {"forwards": [s]}, "homeTeam": {}}}, 1, country, "XXX")
+        for s, country in zip(skaters, countries + ["XXX"])
+    ], ignore_index=True)
+
+    log = game_log(players, rows, picked["playerId"].tolist())
+    assert list(log.columns) == GAME_LOG_COLUMNS and len(log) == 2, log
+    assert log["TOI"].tolist() == ["12:05", "12:05"], log
+    # Ei osumia: joukkueen pelaajat eivät ole pelanneet (ja tyhjä valinta)
+    for player_ids in [players["playerId"].iloc[2:4].tolist(), []]:
+        empty = game_log(players, rows, player_ids)
+        assert list(empty.columns) == GAME_LOG_COLUMNS and empty.empty, empty
+
+
+def with_ids(path, tmp_dir, every=3):
+    """Rosterin kopio, jossa joka kolmannella rivillä on NHL-ID (ID-liitoksen tarkistus)"""
+    roster = pd.read_csv(path, dtype=str, keep_default_na=False)
+    roster["playerId"] = [str(8470000 + i) if i % every == 0 else "" for i in range(len(roster))]
+    id_path = os.path.join(tmp_dir, "roster_with_ids.csv")
+    roster.to_csv(id_path, index=False)
+    return id_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the DataFrame player join against the old per-row loop")
+    parser.add_argument("--roster", default=ROSTER_FILE)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        id_path = with_ids(args.roster, tmp)
+        for path in [args.roster, id_path]:
+            roster, _ = load_roster(path)
+            name_keys = [
+                create_short_key(r.firstName, r.lastName) + f"_{clean_name(r.teamName)}"
+                for r in roster.itertuples()
+            ]
+            # ID-riveillä API:n avain on NHL-ID, muilla nimiavain (kuten parse_boxscore)
+            keys = [
+                (int(nhl_id) if pd.notna(nhl_id) else name_key, name_key)
+                for nhl_id, name_key in zip(roster["nhlId"], name_keys)
+            ]
+            rows = check(path, {})
+            for seed in range(args.rounds):
+                check(path, random_stats(keys, random.Random(seed)))
+            print(f"{os.path.basename(path)}: {rows} rows identical over {args.rounds} random stat sets + empty stats")
+            check_game_log(path)
+            print(f"{os.path.basename(path)}: game_log id/name matches and no-match team ok")
+
+
+if __name__ == "__main__":
+    main()
@@ -24,6 +24,11 @@ FIREBASE_CONFIG = {
 
 # Muut asetukset
 NHL_API_BASE_URL = "https://api-web.nhle.com/v1"
+# Pistesnapshotin säilö: "file" (vain tämä prosessi), "sqlite" (saman koneen prosessit)
+# tai "firestore" (kaikki repliikat; vain yksi hakee NHL API:sta)
+SCORE_STORE = get_secret("SCORE_STORE", "file")
+# NHL API -vastausten JSON-dekooderi: "auto" (orjson jos asennettu), "json" tai "orjson"
+NHL_JSON_BACKEND = get_secret("NHL_JSON_BACKEND", "auto")
 TOURNAMENT_SEASON = "20252026"
 TOURNAMENT_GAME_TYPE = "3"
 
@@ -1,64 +1,281 @@
-import pandas as pd
-import requests
+import argparse
+import json
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# 1. Määritellään funktio ID:n hakuun selaimen valepuvussa
-def get_nhl_player_id(first_name, last_name):
-    """Hakee pelaajan ID:n NHL API:sta nimen perusteella."""
-    search_name = f"{first_name} {last_name}"
-    url = f"https://api-web.nhle.com/v1/search/player?culture=en-us&limit=5&q={search_name}"
-    
-    # TÄRKEÄ: User-Agent estää NHL:ää torjumasta pyyntöä "bottina"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    }
-    
+import pandas as pd
+
+from live_scoring import clean_name, write_atomic, write_json_atomic
+from nhl_client import get_client
+
+# Hakujen rinnakkaisuus ja nopeusrajoitus (pyyntöä sekunnissa, hetkellinen purske)
+MAX_WORKERS = 4
+REQUESTS_PER_SECOND = 5
+BURST = 5
+
+# Tulos tallennetaan välillä näin monen haun jälkeen, jotta kaatuminen ei hukkaa työtä
+CHECKPOINT_EVERY = 10
+
+# Hakuvastaukset tallennetaan levylle kyselyn mukaan: uusintaajo ei tee verkkokutsuja
+SEARCH_CACHE_FILE = "search_cache.json"
+
+# Rosterin maakoodit ovat IOC-koodeja, NHL:n birthCountry on ISO 3166 -koodi
+IOC_TO_ISO = {"SUI": "CHE", "GER": "DEU", "DEN": "DNK", "LAT": "LVA", "SLO": "SVN", "NED": "NLD"}
+
+# NHL:n positionCode → rosterin F/D/G
+POSITION_GROUPS = {"C": "F", "L": "F", "R": "F", "D": "D", "G": "G"}
+
+
+# 1. Apuluokat: nopeusrajoitin ja hakuvälimuisti
+class TokenBucket:
+    """Token bucket: sallii keskimäärin `rate` pyyntöä sekunnissa, purskeena enintään `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SearchCache:
+    """search/player-vastaukset levyllä, avaimena hakumerkkijono"""
+
+    def __init__(self, path=SEARCH_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, encoding="utf-8") as f:
+                self._data = json.load(f)
+        except (OSError, ValueError):
+            self._data = {}
+
+    def get(self, query):
+        with self._lock:
+            return self._data.get(query)
+
+    def put(self, query, response):
+        with self._lock:
+            self._data[query] = response
+
+    def save(self):
+        # Kopio lukon alla: put() voi lisätä avaimia kirjoituksen aikana
+        with self._lock:
+            data = dict(self._data)
+        write_json_atomic(self.path, data, ensure_ascii=False)
+
+
+# 2. Määritellään funktio ID:n hakuun selaimen valepuvussa
+def search_players(search_name, cache=None, bucket=None):
+    """Palauttaa search/player-vastauksen (lista) välimuistista tai API:sta; virheellä None"""
+    if cache is not None:
+        cached = cache.get(search_name)
+        if cached is not None:
+            return cached
+
+    if bucket is not None:
+        bucket.acquire()
+
+    params = {"culture": "en-us", "limit": 5, "q": search_name}
     try:
-        r = requests.get(url, headers=headers, timeout=5)
-        
-        if r.status_code == 200:
-            data = r.json()
-            if data:
-                # Palautetaan listan ensimmäisen pelaajan ID
-                return data[0].get('playerId')
-            else:
-                print(f"  -> API vastasi, mutta ei löytänyt nimeä: '{search_name}'")
-        else:
-            print(f"  -> HTTP Virhe {r.status_code} nimelle {search_name}")
-            
+        # Jaettu asiakas lisää User-Agentin ja pitää yhteyden auki hakujen välillä
+        r = get_client().get("search/player", params=params, timeout=5)
     except Exception as e:
         print(f"  -> Tekninen virhe: {e}")
-    
+        return None
+
+    if r.status_code != 200:
+        print(f"  -> HTTP Virhe {r.status_code} nimelle {search_name}")
+        return None
+
+    try:
+        data = r.json()
+    except ValueError:
+        # Esim. välityspalvelimen HTML-sivu 200-vastauksena: ei kaadeta koko erää
+        print(f"  -> Virheellinen JSON-vastaus nimelle {search_name}")
+        return None
+    if cache is not None:
+        cache.put(search_name, data)
+    return data
+
+
+def get_nhl_player_id(first_name, last_name, cache=None, bucket=None):
+    """Hakee pelaajan ID:n NHL API:sta nimen perusteella."""
+    search_name = f"{first_name} {last_name}"
+    data = search_players(search_name, cache=cache, bucket=bucket)
+
+    if data:
+        # Palautetaan listan ensimmäisen pelaajan ID
+        return data[0].get('playerId')
+    if data is not None:
+        print(f"  -> API vastasi, mutta ei löytänyt nimeä: '{search_name}'")
     return None
 
-# 2. Pääohjelma
-if __name__ == "__main__":
-    input_file = "input_players.csv"
-    output_file = "olympic_players_with_ids.csv"
-    
+
+# 3. Bulk-haku: NHL-joukkueiden rosterit yhdeksi hakemistoksi
+def fetch_team_abbrevs(client):
+    """Kaikkien NHL-joukkueiden lyhenteet standings-rajapinnasta"""
+    standings = client.get_json("standings/now")
+    return sorted({t['teamAbbrev']['default'] for t in standings.get('standings', [])})
+
+
+def _roster_entries(client, team):
     try:
-        # Ladataan CSV
-        # dtype=str varmistaa ettei ID-sarakkeet mene sekaisin jos siellä on jo jotain
-        df = pd.read_csv(input_file, dtype={'playerId': str})
-    except FileNotFoundError:
-        print(f"VIRHE: Tiedostoa '{input_file}' ei löydy.")
-        exit()
+        roster = client.get_json(f"roster/{team}/current")
+    except Exception as e:
+        print(f"  -> Rosterin haku epäonnistui joukkueelle {team}: {e}")
+        return []
 
-    print(f"Aloitetaan haku {len(df)} pelaajalle...")
-    print("-" * 50)
+    entries = []
+    for group in ['forwards', 'defensemen', 'goalies']:
+        for p in roster.get(group, []):
+            entries.append({
+                "playerId": p.get('id'),
+                "name_key": clean_name(p.get('firstName', {}).get('default', '')) + clean_name(p.get('lastName', {}).get('default', '')),
+                "country": p.get('birthCountry', ''),
+                "position": POSITION_GROUPS.get(p.get('positionCode'), ''),
+                "team": team,
+            })
+    return entries
 
-    found_count = 0
-    missing_count = 0
 
-    for index, row in df.iterrows():
-        # Puhdistetaan nimet ylimääräisistä väleistä
+def build_player_index(client=None, teams=None, workers=MAX_WORKERS):
+    """
+    Lataa kaikkien joukkueiden rosterit (yksi pyyntö per joukkue) ja palauttaa
+    hakemiston {normalisoitu koko nimi: [ehdokkaat]} ID-järjestyksessä.
+    """
+    client = client or get_client()
+    teams = teams or fetch_team_abbrevs(client)
+    index = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for entries in pool.map(lambda t: _roster_entries(client, t), teams):
+            for entry in entries:
+                candidates = index.setdefault(entry['name_key'], [])
+                # Sama pelaaja voi näkyä kahdessa rosterissa kaupan jälkeen
+                if all(c['playerId'] != entry['playerId'] for c in candidates):
+                    candidates.append(entry)
+    for candidates in index.values():
+        candidates.sort(key=lambda c: c['playerId'])
+    return index
+
+
+def match_player(index, first_name, last_name, country, position):
+    """
+    Palauttaa (playerId, ehdokkaat, syy). Ehdokkaita rajataan maalla ja pelipaikalla;
+    ID palautetaan vain, jos täsmälleen yksi saman maan ehdokas jää jäljelle. Muuten
+    syy on "ambiguous" (useita saman maan ehdokkaita) tai "country mismatch" (nimi
+    löytyy vain muiden maiden pelaajilta, esim. kaima), ja ID jätetään kirjoittamatta.
+    """
+    candidates = index.get(clean_name(first_name) + clean_name(last_name), [])
+    iso = IOC_TO_ISO.get(country, country)
+    for narrowed in (
+        [c for c in candidates if c['country'] == iso and c['position'] == position],
+        [c for c in candidates if c['country'] == iso],
+    ):
+        if len(narrowed) == 1:
+            return narrowed[0]['playerId'], narrowed, None
+        if len(narrowed) > 1:
+            return None, narrowed, "ambiguous"
+    if candidates:
+        return None, candidates, "country mismatch"
+    return None, [], None
+
+
+def resolve_from_index(df, index):
+    """
+    Täyttää puuttuvat ID:t hakemistosta yhdellä läpikäynnillä.
+    Palauttaa (löytyneet, [moniselitteiset rivit], [löytymättömät rivit]). Moniselitteisissä
+    on match_playerin syy ("ambiguous" tai "country mismatch"); löytymättömissä
+    on myös df:n rivi-indeksi ("index") nimihakua varten.
+    """
+    found_count = 0
+    ambiguous = []
+    unmatched = []
+    for idx, row in df.iterrows():
+        if not _missing_id(row['playerId']):
+            continue
         fname = str(row['firstName']).strip()
         lname = str(row['lastName']).strip()
-        
-        # Jos ID puuttuu (on NaN tai tyhjä), haetaan se
-        if pd.isna(row['playerId']) or row['playerId'] == "":
-            pid = get_nhl_player_id(fname, lname)
-            
+        pid, candidates, reason = match_player(index, fname, lname, str(row['teamName']), str(row['position']))
+        if pid:
+            df.at[idx, 'playerId'] = str(pid)
+            found_count += 1
+        elif candidates:
+            ambiguous.append({
+                "firstName": fname, "lastName": lname, "teamName": row['teamName'], "reason": reason,
+                "candidates": " | ".join(f"{c['playerId']} ({c['team']} {c['country']} {c['position']})" for c in candidates),
+            })
+        else:
+            unmatched.append({"index": idx, "firstName": fname, "lastName": lname, "teamName": row['teamName']})
+    return found_count, ambiguous, unmatched
+
+
+def _write_csv(df, path):
+    write_atomic(path, lambda f: df.to_csv(f, index=False))
+
+
+def _missing_id(value):
+    return pd.isna(value) or value == ""
+
+
+def resume_from(df, output_file):
+    """Kopioi aiemman ajon löytämät ID:t (output_file) puuttuville riveille"""
+    if not os.path.exists(output_file):
+        return 0
+    previous = pd.read_csv(output_file, dtype={'playerId': str})
+    known = {
+        (str(r.firstName).strip(), str(r.lastName).strip(), str(r.teamName)): r.playerId
+        for r in previous.itertuples()
+        if not _missing_id(r.playerId)
+    }
+    restored = 0
+    for index, row in df.iterrows():
+        key = (str(row['firstName']).strip(), str(row['lastName']).strip(), str(row['teamName']))
+        if _missing_id(row['playerId']) and key in known:
+            df.at[index, 'playerId'] = known[key]
+            restored += 1
+    return restored
+
+
+def resolve_batch(df, output_file, workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND,
+                  checkpoint_every=CHECKPOINT_EVERY, cache=None, rows=None):
+    """
+    Hakee puuttuvat ID:t rinnakkain nopeusrajoituksen alla ja tallentaa tuloksen
+    output_fileen välillä. `rows` rajaa haun annettuihin rivi-indekseihin (oletus:
+    kaikki rivit, joilta ID puuttuu). Palauttaa (löytyneet, puuttuvat).
+    """
+    bucket = TokenBucket(rate, BURST)
+    candidates = df if rows is None else df.loc[list(rows)]
+    todo = [
+        (index, str(row['firstName']).strip(), str(row['lastName']).strip())
+        for index, row in candidates.iterrows()
+        if _missing_id(row['playerId'])
+    ]
+
+    found_count = 0
+    missing_count = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(get_nhl_player_id, fname, lname, cache, bucket): (index, fname, lname)
+            for index, fname, lname in todo
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            index, fname, lname = futures[future]
+            pid = future.result()
             if pid:
                 df.at[index, 'playerId'] = str(pid)
                 print(f"✅ Löytyi: {fname} {lname} -> {pid}")
@@ -66,16 +283,82 @@ if __name__ == "__main__":
             else:
                 print(f"❌ EI LÖYTYNYT: {fname} {lname}")
                 missing_count += 1
-            
-            # Pieni tauko pyyntöjen välissä
-            time.sleep(0.2)
-        else:
-            # ID oli jo olemassa
-            pass
+
+            # Välitallennus: uudelleenkäynnistys jatkaa tästä
+            if done % checkpoint_every == 0:
+                _write_csv(df, output_file)
+                if cache is not None:
+                    cache.save()
+
+    _write_csv(df, output_file)
+    if cache is not None:
+        cache.save()
+    return found_count, missing_count
+
+
+# 4. Pääohjelma
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hakee rosterin pelaajille NHL-ID:t")
+    parser.add_argument("--input", default="input_players.csv")
+    # Tulos kopioidaan olympic_players.csv:n tilalle: sovellus lukee playerId-sarakkeen NHL-ID:nä
+    parser.add_argument("--output", default="olympic_players_with_ids.csv")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND, help="pyyntöä sekunnissa")
+    parser.add_argument("--cache", default=SEARCH_CACHE_FILE)
+    parser.add_argument("--bulk", action="store_true", help="hae ID:t NHL-rosterien perusteella (yksi pyyntö per joukkue)")
+    parser.add_argument("--search-fallback", action="store_true", help="bulk-tilassa: hae löytymättömät vielä nimihaulla")
+    parser.add_argument("--ambiguous", default="ambiguous_players.csv")
+    args = parser.parse_args()
+
+    try:
+        # Ladataan CSV
+        # dtype=str varmistaa ettei ID-sarakkeet mene sekaisin jos siellä on jo jotain
+        df = pd.read_csv(args.input, dtype={'playerId': str})
+    except FileNotFoundError:
+        print(f"VIRHE: Tiedostoa '{args.input}' ei löydy.")
+        exit()
+
+    # Rosterissa (olympic_players.csv) ei välttämättä ole vielä ID-saraketta
+    if 'playerId' not in df.columns:
+        df['playerId'] = None
+
+    restored = resume_from(df, args.output)
+    if restored:
+        print(f"Jatketaan edellisestä ajosta: {restored} ID:tä löytyi jo tiedostosta {args.output}")
+
+    print(f"Aloitetaan haku {len(df)} pelaajalle...")
+    print("-" * 50)
+
+    if args.bulk:
+        index = build_player_index(workers=args.workers)
+        found_count, ambiguous, unmatched = resolve_from_index(df, index)
+        missing_count = len(ambiguous) + len(unmatched)
+        _write_csv(df, args.output)
+        mismatched = sum(a['reason'] == "country mismatch" for a in ambiguous)
+        print(f"Rostereista löytyi {found_count}, moniselitteisiä {len(ambiguous) - mismatched}, "
+              f"maa ei täsmää {mismatched}, ei löytynyt {len(unmatched)}")
+
+        if ambiguous:
+            pd.DataFrame(ambiguous).to_csv(args.ambiguous, index=False)
+            print(f"Moniselitteiset tallennettu tiedostoon: {args.ambiguous}")
+            for a in ambiguous:
+                print(f"❓ {a['firstName']} {a['lastName']} ({a['teamName']}, {a['reason']}): {a['candidates']}")
+        for u in unmatched:
+            print(f"❌ EI NHL-ROSTERISSA: {u['firstName']} {u['lastName']} ({u['teamName']})")
+
+        if args.search_fallback and unmatched:
+            # Vain löytymättömät: moniselitteisiä ei arvata nimihaun ensimmäisellä osumalla
+            extra_found, extra_missing = resolve_batch(
+                df, args.output, workers=args.workers, rate=args.rate, cache=SearchCache(args.cache),
+                rows=[u['index'] for u in unmatched],
+            )
+            found_count += extra_found
+            missing_count = len(ambiguous) + extra_missing
+    else:
+        found_count, missing_count = resolve_batch(
+            df, args.output, workers=args.workers, rate=args.rate, cache=SearchCache(args.cache)
+        )
 
     print("-" * 50)
-    
-    # Tallennetaan tulos
-    df.to_csv(output_file, index=False)
     print(f"Valmis! Löytyi: {found_count}, Puuttui: {missing_count}")
-    print(f"Tiedot tallennettu tiedostoon: {output_file}")
+    print(f"Tiedot tallennettu tiedostoon: {args.output}")
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+class LineupMatrix:
+    """
+    Kaikkien joukkueiden kokoonpanot yhtenä (joukkueet × paikat) int32-taulukkona.
+    Jokainen rosterin playerId saa tiheän indeksin; tyhjät paikat ja rosterista puuttuvat
+    pelaajat osoittavat viimeiseen indeksiin, jonka pisteet ovat aina 0. Taulukko riippuu
+    vain joukkueista ja rosterista, joten maali vaatii vain uuden pistevektorin.
+    """
+
+    def __init__(self, player_ids, teams):
+        self.player_index = {}
+        for pid in player_ids:
+            # Nimiavaimet voivat toistua rosterissa: sama avain, sama indeksi
+            self.player_index.setdefault(pid, len(self.player_index))
+        self.team_names = [team['team_name'] for team in teams]
+        self.pad = len(self.player_index)
+
+        lineups = [team.get('player_ids', []) for team in teams]
+        width = max((len(ids) for ids in lineups), default=0)
+        self.lineups = np.full((len(lineups), width), self.pad, dtype=np.int32)
+        # Kaikki paikat yhdellä sijoituksella: rivi = joukkue, sarake = paikka joukkueen listassa
+        lengths = np.fromiter(map(len, lineups), dtype=np.int64, count=len(lineups))
+        flat = np.fromiter(
+            (self.player_index.get(pid, self.pad) for ids in lineups for pid in ids),
+            dtype=np.int32, count=int(lengths.sum()),
+        )
+        rows = np.repeat(np.arange(len(lineups)), lengths)
+        cols = np.arange(len(flat)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        self.lineups[rows, cols] = flat
+
+    def points_vector(self, points_by_id):
+        """{playerId: pisteet} → vektori indeksijärjestyksessä (+ nollapaikka lopussa)"""
+        points = np.zeros(self.pad + 1, dtype=np.int64)
+        for pid, pts in points_by_id.items():
+            i = self.player_index.get(pid)
+            if i is not None:
+                points[i] = pts
+        return points
+
+    def team_totals(self, points):
+        """Kaikkien joukkueiden pisteet yhdellä gather-summalla, joukkueiden järjestyksessä"""
+        return points[self.lineups].sum(axis=1)
@@ -0,0 +1,508 @@
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from nhl_client import MAX_RETRIES, REQUEST_TIMEOUT, CircuitOpenError, get_client
+
+logger = logging.getLogger(__name__)
+
+# Turnauksen päivät (schedule-haku tehdään näille)
+START_DATE = "2025-02-12"
+END_DATE = "2025-02-20"
+
+# Olympia-/turnauspelien gameType-arvot
+TOURNAMENT_GAME_TYPES = (9, 19)
+
+# Pelin tilat, joiden jälkeen boxscore ei enää muutu
+FINAL_GAME_STATES = {"OFF", "FINAL"}
+
+# Boxscoren rivit pelaaja per peli; toi sekunteina, wins/shutouts maalivahdeille 0/1
+BOX_COLUMNS = {
+    'key': object,
+    'game_id': np.int64,
+    'player_id': np.int64,
+    'name_key': object,
+    'team': object,
+    'position': object,
+    'goals': np.int64,
+    'assists': np.int64,
+    'toi': np.int64,
+    'saves': np.int64,
+    'shots_against': np.int64,
+    'decision': object,
+    'wins': np.int64,
+    'shutouts': np.int64,
+}
+
+# Boxscoren pelaajakentät, joita parse_boxscore lukee; muut karsitaan heti dekoodauksen jälkeen
+BOX_PLAYER_FIELDS = (
+    'playerId', 'name', 'firstName', 'lastName', 'position', 'goals', 'assists', 'toi',
+    'saves', 'shotsAgainst', 'goalsAgainst', 'decision',
+)
+
+# Pelaajakohtaiset tilastot, jotka summataan peleistä (pisteytys: scoring_rules.py)
+STAT_FIELDS = ('goals', 'assists', 'wins', 'shutouts')
+
+# Turnauksen otteluohjelma tallennetaan levylle, jotta valmiita viikkoja ei haeta uudelleen
+SCHEDULE_INDEX_FILE = "schedule_index.json"
+
+# Samanaikaisten pyyntöjen katto (pysyy NHLClientin poolin koon alla)
+MAX_WORKERS = 6
+
+
+def write_atomic(path, write):
+    """
+    Kirjoittaa tiedoston kirjoittajan omaan väliaikaistiedostoon samassa hakemistossa
+    (`write(f)` saa tekstitiedoston) ja vaihtaa sen paikalleen os.replacella: rinnakkaiset
+    prosessit eivät katkaise toistensa kesken olevaa tiedostoa. Virheet jätetään kutsujalle.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)), prefix=f"{os.path.basename(path)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_json_atomic(path, payload, **dump_args):
+    """JSON write_atomicilla; virheet (OSError) jätetään kutsujalle"""
+    write_atomic(path, lambda f: json.dump(payload, f, **dump_args))
+
+
+# Samat nimet toistuvat jokaisessa boxscoressa: normalisointi tehdään kerran per nimi
+@functools.lru_cache(maxsize=4096)
+def clean_name(name):
+    """Normalisoi nimen: poistaa erikoismerkit, välilyönnit, alaviivat ja PI STEET"""
+    if not name:
+        return ""
+    n = unicodedata.normalize('NFKD', str(name)).encode('ASCII', 'ignore').decode('utf-8')
+    # Poista VÄLILYÖNIT, ALAVIIVAT ja PISTEET
+    return n.lower().strip().replace(" ", "").replace("_", "").replace(".", "")
+
+
+@functools.lru_cache(maxsize=4096)
+def create_short_key(first_name, last_name):
+    """
+    Luo lyhennetty avain API:n mukaan: eka kirjain + sukunimi (EI pistettä!)
+    Esimerkki: "Tomas", "Hertl" → "thertl"
+    """
+    if not first_name or not last_name:
+        return ""
+    first_initial = first_name[0].lower()
+    last_clean = clean_name(last_name)
+    return f"{first_initial}{last_clean}"  # EI pistettä väliin!
+
+
+class GameCache:
+    """Pelikohtainen välimuisti jäsennetyille boxscoreille; päättyneet pelit jäädytetään"""
+
+    def __init__(self):
+        self._games = {}
+        self._lock = threading.Lock()
+
+    def get_final(self, game_id):
+        """Palauttaa päättyneen pelin pelaajarivit tai None, jos peli pitää hakea"""
+        with self._lock:
+            entry = self._games.get(game_id)
+        if entry and entry['state'] in FINAL_GAME_STATES:
+            return entry['stats']
+        return None
+
+    def store(self, game_id, state, game_stats):
+        with self._lock:
+            self._games[game_id] = {'state': state, 'stats': game_stats}
+
+    def state(self, game_id):
+        """Viimeisimmän boxscoren gameState tai None, jos peliä ei ole haettu"""
+        with self._lock:
+            entry = self._games.get(game_id)
+        return entry['state'] if entry else None
+
+    def final_count(self):
+        with self._lock:
+            return sum(1 for e in self._games.values() if e['state'] in FINAL_GAME_STATES)
+
+    def clear(self):
+        with self._lock:
+            self._games.clear()
+
+
+# Prosessin yhteinen pelivälimuisti (säilyy st.cache_data-vanhenemisten yli)
+game_cache = GameCache()
+
+
+def _date_range(start_date, end_date):
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    return [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+
+
+class ScheduleCatalog:
+    """
+    Turnauksen otteluohjelma pelitunnisteittain. schedule/{date} palauttaa koko viikon,
+    joten yksi haku kattaa seitsemän päivää. Mennyt päivä, jonka kaikki pelit ovat
+    päättyneet, on valmis eikä sitä haeta enää koskaan.
+    """
+
+    def __init__(self, path=SCHEDULE_INDEX_FILE):
+        self.path = path
+        self.games = {}
+        self.days = {}
+        self.final_dates = set()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.games = {int(k): v for k, v in data.get("games", {}).items()}
+        self.days = data.get("days", {})
+        self.final_dates = set(data.get("final_dates", []))
+
+    def _save(self):
+        if not self.path:
+            return
+        payload = {"games": self.games, "days": self.days, "final_dates": sorted(self.final_dates)}
+        try:
+            write_json_atomic(self.path, payload)
+        except OSError as e:
+            logger.warning("Could not persist schedule index: %s", e)
+
+    def export(self):
+        """Luettelo samassa muodossa kuin schedule_index.json (tallennetaan myös snapshotiin)"""
+        with self._lock:
+            return {"games": dict(self.games), "days": dict(self.days), "final_dates": sorted(self.final_dates)}
+
+    def seed(self, data):
+        """
+        Täydentää luetteloa tallennetusta otteluohjelmasta (snapshotista): uusi kone tuntee
+        pelit ilman schedule-hakua. Jo tunnettuja pelejä tai päiviä ei korvata.
+        """
+        if not data:
+            return
+        with self._lock:
+            before = (len(self.games), len(self.days), len(self.final_dates))
+            for game_id, game in data.get("games", {}).items():
+                self.games.setdefault(int(game_id), game)
+            for date_str, ids in data.get("days", {}).items():
+                self.days.setdefault(date_str, ids)
+            self.final_dates |= set(data.get("final_dates", []))
+            if (len(self.games), len(self.days), len(self.final_dates)) != before:
+                self._save()
+
+    def _ingest(self, week, wanted):
+        """Tallentaa viikon turnauspelit; palauttaa päivät, jotka vastaus kattoi"""
+        covered = set()
+        for day in week.get('gameWeek', []):
+            date_str = day.get('date')
+            if date_str not in wanted:
+                continue
+            covered.add(date_str)
+            ids = []
+            for g in day.get('games', []):
+                if g.get('gameType') not in TOURNAMENT_GAME_TYPES:
+                    continue
+                ids.append(g['id'])
+                self.games[g['id']] = {
+                    'id': g['id'],
+                    'date': date_str,
+                    'gameType': g.get('gameType'),
+                    'gameState': g.get('gameState'),
+                    'startTimeUTC': g.get('startTimeUTC'),
+                    'awayTeam': {'abbrev': g.get('awayTeam', {}).get('abbrev')},
+                    'homeTeam': {'abbrev': g.get('homeTeam', {}).get('abbrev')},
+                }
+            self.days[date_str] = ids
+        return covered
+
+    def refresh(self, client, start_date, end_date, today, pool, timeout, retries):
+        """
+        Hakee viikot, joissa on vielä keskeneräisiä päiviä; valmiit päivät ohitetaan.
+        Palauttaa epäonnistuneiden viikkohakujen määrän.
+        """
+        wanted = set(_date_range(start_date, end_date))
+        with self._lock:
+            pending = sorted(wanted - self.final_dates)
+            changed = False
+            failed = 0
+            while pending:
+                # Yksi haku per alkava viikko; vastauksen kattamat päivät poistuvat listalta
+                starts = []
+                for d in pending:
+                    if not starts or date.fromisoformat(d) - date.fromisoformat(starts[-1]) >= timedelta(days=7):
+                        starts.append(d)
+
+                def fetch(d):
+                    try:
+                        return client.get_json(f"schedule/{d}", timeout=timeout, retries=retries)
+                    except Exception as e:
+                        logger.warning("Schedule fetch failed for week of %s: %s", d, e)
+                        return None
+
+                covered = set(starts)
+                weeks = list(pool.map(fetch, starts))
+                for week in weeks:
+                    if week is None:
+                        failed += 1
+                    else:
+                        covered |= self._ingest(week, wanted)
+                        changed = True
+                if all(week is None for week in weeks):
+                    # API ei vastaa: ei kokeilla jäljellä olevia päiviä yksitellen
+                    break
+                pending = [d for d in pending if d not in covered]
+
+            today_str = today.isoformat()
+            for d in wanted - self.final_dates:
+                if d in self.days and d < today_str and all(
+                    self.games[g]['gameState'] in FINAL_GAME_STATES for g in self.days[d]
+                ):
+                    self.final_dates.add(d)
+                    changed = True
+            if changed:
+                self._save()
+            return failed
+
+    def all_games(self):
+        with self._lock:
+            return list(self.games.values())
+
+    def is_final(self, start_date=START_DATE, end_date=END_DATE):
+        """Koko turnaus pelattu: jokainen päivä on merkitty valmiiksi"""
+        with self._lock:
+            return set(_date_range(start_date, end_date)) <= self.final_dates
+
+    def games_until(self, today):
+        """Turnauspelit, joiden päivä on viimeistään tänään, päivän ja ID:n mukaan"""
+        today_str = today.isoformat()
+        with self._lock:
+            return sorted(
+                (g for g in self.games.values() if g['date'] <= today_str),
+                key=lambda g: (g['date'], g['id']),
+            )
+
+
+# Prosessin yhteinen otteluohjelma
+schedule_catalog = ScheduleCatalog()
+
+
+def _toi_seconds(toi):
+    """"MM:SS" → sekunnit"""
+    minutes, _, seconds = (toi or "0:00").partition(":")
+    try:
+        return int(minutes) * 60 + int(seconds or 0)
+    except ValueError:
+        return 0
+
+
+def select_boxscore(box):
+    """Boxscoresta vain parse_boxscoren tarvitsemat osat: gameState ja pelaajien BOX_PLAYER_FIELDS"""
+    by_team = box.get('playerByGameStats', {})
+    return {
+        'gameState': box.get('gameState'),
+        'playerByGameStats': {
+            team_type: {
+                group: [
+                    {f: p[f] for f in BOX_PLAYER_FIELDS if f in p}
+                    for p in by_team.get(team_type, {}).get(group, [])
+                ]
+                for group in ['forwards', 'defense', 'goalies']
+            }
+            for team_type in ['awayTeam', 'homeTeam']
+        },
+    }
+
+
+def parse_boxscore(box, game_id, away_abbr, home_abbr):
+    """
+    Käy boxscoren läpi kerran ja kirjoittaa jokaisen pelaajan rivin valmiiksi varattuihin
+    sarakkeisiin (BOX_COLUMNS). Palauttaa pelin rivit DataFramena; key = NHL playerId tai
+    puuttuessa nimiavain, name_key = nimiavain rosterin varapolkua varten.
+    """
+    by_team = box.get('playerByGameStats', {})
+    sides = [
+        (by_team.get(team_type, {}).get(group, []), country_code, group)
+        for team_type, country_code in [('awayTeam', away_abbr), ('homeTeam', home_abbr)]
+        for group in ['forwards', 'defense', 'goalies']
+    ]
+    n = sum(len(players) for players, _, _ in sides)
+    cols = {c: np.zeros(n, dtype=dtype) if dtype != object else np.empty(n, dtype=object)
+            for c, dtype in BOX_COLUMNS.items()}
+
+    i = 0
+    for players, country_code, group in sides:
+        country_key = clean_name(country_code)
+        for p in players:
+            # Käytä lyhennettyä nimeä API:sta (esim. "T. Konecny" → "tkonecny", ei pistettä)
+            name_default = p.get('name', {}).get('default', '')
+            if name_default:
+                name_key = f"{clean_name(name_default)}_{country_key}"
+            else:
+                fn = p.get('firstName', {}).get('default', '')
+                ln = p.get('lastName', {}).get('default', '')
+                name_key = create_short_key(fn, ln) + f"_{country_key}"
+
+            player_id = p.get('playerId') or 0
+            decision = p.get('decision') or ""
+            goals_against = int(p.get('goalsAgainst', 0))
+            # Ilman playerId:tä (ei pitäisi tapahtua) rivi avainnetaan nimellä
+            cols['key'][i] = player_id or name_key
+            cols['game_id'][i] = game_id
+            cols['player_id'][i] = player_id
+            cols['name_key'][i] = name_key
+            cols['team'][i] = country_code or ""
+            cols['position'][i] = p.get('position', 'G' if group == 'goalies' else '')
+            cols['goals'][i] = int(p.get('goals', 0))
+            cols['assists'][i] = int(p.get('assists', 0))
+            cols['toi'][i] = _toi_seconds(p.get('toi'))
+            cols['saves'][i] = int(p.get('saves', 0))
+            cols['shots_against'][i] = int(p.get('shotsAgainst', 0))
+            cols['decision'][i] = decision
+            cols['wins'][i] = group == 'goalies' and decision == 'W'
+            # Nollapeli voittaneelle maalivahdille, joka ei päästänyt maalia
+            cols['shutouts'][i] = cols['wins'][i] and goals_against == 0
+            i += 1
+    return pd.DataFrame(cols)
+
+
+def _fetch_game_stats(client, game, timeout, retries, cache):
+    """Pelin pisteet; None, jos boxscorea ei saatu"""
+    game_id = game.get('id')
+    frozen = cache.get_final(game_id)
+    if frozen is not None:
+        return frozen
+
+    try:
+        box = client.get_json(f"gamecenter/{game_id}/boxscore", timeout=timeout, retries=retries,
+                              select=select_boxscore)
+    except Exception as e:
+        logger.warning("Boxscore fetch failed for game %s: %s", game_id, e)
+        return None
+
+    away_abbr = game.get('awayTeam', {}).get('abbrev')
+    home_abbr = game.get('homeTeam', {}).get('abbrev')
+    game_stats = parse_boxscore(box, game_id, away_abbr, home_abbr)
+    cache.store(game_id, box.get('gameState'), game_stats)
+    return game_stats
+
+
+class CrawlResult(NamedTuple):
+    """
+    Yhden haun tulos: game_stats = {game_id: pelin rivit (parse_boxscore)};
+    failed_games = pelit, joiden boxscorea ei saatu; schedule = ScheduleCatalog.export()
+    haun jälkeen, jotta snapshotista lämmin käynnistys tuntee myös otteluohjelman
+    """
+    game_stats: Dict
+    failed_games: Tuple
+    schedule_failures: int = 0
+    schedule: Optional[Dict] = None
+
+    @property
+    def complete(self):
+        return not self.failed_games and not self.schedule_failures
+
+
+def box_rows(game_stats):
+    """Kaikkien pelien rivit yhtenä taulukkona pelien ID-järjestyksessä (pelikohtaiseen tarkasteluun)"""
+    if not game_stats:
+        return pd.DataFrame({c: pd.Series(dtype=dtype) for c, dtype in BOX_COLUMNS.items()})
+    return pd.concat([game_stats[game_id] for game_id in sorted(game_stats)], ignore_index=True)
+
+
+def aggregate_rows(rows):
+    """Pelaajien summat yhdellä ryhmittelyllä: {key: {*STAT_FIELDS, 'name_key'}}"""
+    totals = rows.groupby('key', sort=False).agg(
+        **{field: (field, 'sum') for field in STAT_FIELDS}, name_key=('name_key', 'first'),
+    )
+    columns = [totals[field].tolist() for field in STAT_FIELDS]
+    return {
+        key: {**dict(zip(STAT_FIELDS, values)), 'name_key': name_key}
+        for key, name_key, *values in zip(totals.index, totals['name_key'], *columns)
+    }
+
+
+def merge_game_stats(game_stats):
+    """{game_id: pelin rivit} → {key: {*STAT_FIELDS, 'name_key'}} (ks. aggregate_rows)"""
+    return aggregate_rows(box_rows(game_stats))
+
+
+def _crawl_games(client, games, pool, timeout, retries, cache):
+    results = pool.map(lambda g: _fetch_game_stats(client, g, timeout, retries, cache), games)
+    game_stats = {}
+    failed = []
+    for game, stats in zip(games, results):
+        if stats is None:
+            failed.append(game)
+        else:
+            game_stats[game['id']] = stats
+    return game_stats, tuple(failed)
+
+
+def crawl_live_scoring(client=None, start_date=START_DATE, end_date=END_DATE,
+                       max_workers=MAX_WORKERS, timeout=REQUEST_TIMEOUT, retries=MAX_RETRIES,
+                       today=None, cache=None, catalog=None):
+    """
+    Hakee turnauksen pisteet rinnakkain: ensin otteluohjelma viikoittain (vain
+    keskeneräiset viikot), sitten tunnettujen pelien boxscoret. Päättyneet pelit
+    luetaan pelivälimuistista hakematta. Epäonnistuneet pelit palautetaan
+    CrawlResult.failed_games-kentässä (ks. retry_failed_games). Jos hakuja epäonnistui
+    ja NHL API:n katkaisija on auki, nostaa CircuitOpenError: vajaata tulosta ei julkaista.
+    """
+    client = client or get_client()
+    cache = cache or game_cache
+    catalog = catalog or schedule_catalog
+    today = today or datetime.now().date()
+    if today.isoformat() < start_date:
+        return CrawlResult({}, ())
+
+    # Yksi rajattu pool = samanaikaisten pyyntöjen katto api-web.nhle.com:iin
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        schedule_failures = catalog.refresh(client, start_date, end_date, today, pool, timeout, retries)
+        games = catalog.games_until(today)
+        game_stats, failed = _crawl_games(client, games, pool, timeout, retries, cache)
+
+    if (schedule_failures or failed) and client.breaker.state != "closed":
+        raise CircuitOpenError(f"NHL API unavailable, {schedule_failures + len(failed)} requests failed")
+    return CrawlResult(game_stats, failed, schedule_failures, catalog.export())
+
+
+def retry_failed_games(result, client=None, max_workers=MAX_WORKERS, timeout=REQUEST_TIMEOUT,
+                       retries=MAX_RETRIES, cache=None):
+    """Hakee uudelleen vain result.failed_games ja yhdistää ne; onnistuneita pelejä ei ladata"""
+    if not result.failed_games:
+        return result
+    client = client or get_client()
+    cache = cache or game_cache
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(result.failed_games))) as pool:
+        game_stats, failed = _crawl_games(client, result.failed_games, pool, timeout, retries, cache)
+    return result._replace(game_stats={**result.game_stats, **game_stats}, failed_games=failed)
+
+
+def fetch_live_scoring(**kwargs):
+    """
+    Palauttaa {playerId: {'goals', 'assists', 'name_key'}} (ks. crawl_live_scoring).
+    Epäonnistuneet pelit puuttuvat summasta.
+    """
+    return merge_game_stats(crawl_live_scoring(**kwargs).game_stats)
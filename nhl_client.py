@@ -0,0 +1,264 @@
+import json
+import random
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import NHL_API_BASE_URL, NHL_JSON_BACKEND
+
+try:
+    import orjson
+except ImportError:  # valinnainen: nopeampi JSON-dekoodaus, toimii ilmankin
+    orjson = None
+
+# TÄRKEÄ: User-Agent estää NHL:ää torjumasta pyyntöä "bottina"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Yhteyspooli: kaikki pyynnöt menevät samaan hostiin, joten yksi pooli riittää
+POOL_CONNECTIONS = 2
+POOL_MAXSIZE = 16
+
+REQUEST_TIMEOUT = 5
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Katkaisija: näin monen peräkkäisen epäonnistuneen haun jälkeen API:a ei kutsuta,
+# vaan sitä koetellaan yhdellä pyynnöllä kasvavin välein (5 s, 10 s, ... max 5 min)
+BREAKER_THRESHOLD = 5
+BREAKER_BASE_DELAY = 5
+BREAKER_MAX_DELAY = 300
+
+# Polun muuttuvat osat korvataan, jotta latenssit kertyvät endpointeittain
+_ENDPOINT_PATTERNS = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}"), "{date}"),
+    (re.compile(r"(?<=/)\d+(?=/|$)"), "{id}"),
+]
+
+
+def json_decoder(backend=NHL_JSON_BACKEND):
+    """Palauttaa bytes → Python -dekooderin valitulle taustalle"""
+    if backend == "orjson" or (backend == "auto" and orjson is not None):
+        if orjson is None:
+            raise ImportError("NHL_JSON_BACKEND=orjson but orjson is not installed")
+        return orjson.loads
+    return json.loads
+
+
+def endpoint_label(path):
+    """Muuntaa polun endpoint-nimeksi, esim. gamecenter/123/boxscore → gamecenter/{id}/boxscore"""
+    label = "/" + path.split("?", 1)[0].strip("/")
+    for pattern, placeholder in _ENDPOINT_PATTERNS:
+        label = pattern.sub(placeholder, label)
+    return label.lstrip("/")
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """NHL API on merkitty alas; pyyntöä ei lähetetty"""
+
+
+class CircuitBreaker:
+    """
+    closed → open peräkkäisten virheiden jälkeen; open → half_open, kun koetusaika
+    koittaa (yksi pyyntö kerrallaan läpi); koetuksen onnistuminen sulkee, epäonnistuminen
+    avaa uudelleen kaksinkertaisella viiveellä.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, base_delay=BREAKER_BASE_DELAY, max_delay=BREAKER_MAX_DELAY):
+        self.threshold = threshold
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = "closed"
+        self.failures = 0
+        self.opened_count = 0
+        self._delay = base_delay
+        self._probe_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Saako pyynnön lähettää nyt; half_open-tilassa vain yksi koetus kerrallaan"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self._probing or time.monotonic() < self._probe_at:
+                return False
+            self.state = "half_open"
+            self._probing = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._delay = self.base_delay
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open":
+                self._delay = min(self._delay * 2, self.max_delay)
+            elif self.state == "closed" and self.failures < self.threshold:
+                return
+            elif self.state == "closed":
+                self._delay = self.base_delay
+                self.opened_count += 1
+            self.state = "open"
+            self._probing = False
+            self._probe_at = time.monotonic() + self._delay
+
+    def status(self):
+        with self._lock:
+            retry_in = max(0.0, self._probe_at - time.monotonic()) if self.state == "open" else 0.0
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "opened": self.opened_count,
+                "retry_in": round(retry_in, 1),
+            }
+
+
+class NHLClient:
+    """Jaettu HTTP-asiakas NHL API:lle: keep-alive-pooli, oletusotsakkeet ja latenssilaskurit"""
+
+    def __init__(self, base_url=NHL_API_BASE_URL, timeout=REQUEST_TIMEOUT,
+                 pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, json_backend=NHL_JSON_BACKEND):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._loads = json_decoder(json_backend)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"User-Agent": USER_AGENT, "Accept": "application/json"})
+        self._stats = {}
+        self._lock = threading.Lock()
+        # Ehdolliset pyynnöt: polku → (ETag, Last-Modified, jäsennetty JSON)
+        self._validators = {}
+        self._conditional = {"hits": 0, "misses": 0}
+        self.breaker = CircuitBreaker()
+
+    def _record(self, path, elapsed, ok):
+        label = endpoint_label(path)
+        with self._lock:
+            s = self._stats.setdefault(label, {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+            s["count"] += 1
+            s["errors"] += 0 if ok else 1
+            s["total_ms"] += elapsed * 1000
+            s["max_ms"] = max(s["max_ms"], elapsed * 1000)
+
+    def get(self, path, params=None, headers=None, timeout=None):
+        """GET polkuun base_urlin alla; kirjaa latenssin endpointin mukaan"""
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        started = time.perf_counter()
+        ok = False
+        try:
+            r = self.session.get(url, params=params, headers=headers, timeout=timeout or self.timeout)
+            ok = r.status_code < 400
+            return r
+        finally:
+            self._record(path, time.perf_counter() - started, ok)
+
+    def _cache_key(self, path, params):
+        return (path.lstrip("/"), tuple(sorted((params or {}).items())))
+
+    def get_json(self, path, params=None, timeout=None, retries=MAX_RETRIES, backoff=BACKOFF_BASE, select=None):
+        """
+        Hakee JSONin; yrittää uudelleen verkkovirheillä ja 429/5xx-vastauksilla.
+        Lähettää If-None-Match/If-Modified-Since, ja 304-vastauksella palauttaa
+        aiemmin jäsennetyn JSONin (sama olio, jota ei saa muokata).
+        `select` karsii vastauksesta tarpeettomat kentät ennen välimuistiin tallennusta;
+        ilman ETagia/Last-Modifiedia vastausta ei säilytetä, joten karsinta ohitetaan.
+        Katkaisijan ollessa auki nostaa heti CircuitOpenError.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"NHL API circuit open, skipped {path}")
+        key = self._cache_key(path, params)
+        for attempt in range(retries + 1):
+            with self._lock:
+                cached = self._validators.get(key)
+            headers = {}
+            if cached:
+                etag, last_modified, _ = cached
+                if etag:
+                    headers["If-None-Match"] = etag
+                if last_modified:
+                    headers["If-Modified-Since"] = last_modified
+
+            try:
+                r = self.get(path, params=params, headers=headers, timeout=timeout)
+                if r.status_code == 304 and cached:
+                    self.breaker.success()
+                    with self._lock:
+                        self._conditional["hits"] += 1
+                    return cached[2]
+                if r.status_code not in RETRY_STATUS_CODES:
+                    # 4xx tarkoittaa, että API vastaa: katkaisijan kannalta onnistuminen
+                    self.breaker.success()
+                    r.raise_for_status()
+                    data = self._loads(r.content)
+                    etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+                    if select is not None and (etag or last_modified):
+                        # Karsinta maksaa CPU:ta, mutta puolittaa _validators-muistin per peli
+                        data = select(data)
+                    with self._lock:
+                        self._conditional["misses"] += 1
+                        if etag or last_modified:
+                            self._validators[key] = (etag, last_modified, data)
+                    return data
+                error = requests.HTTPError(f"HTTP {r.status_code} for {path}", response=r)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            except requests.HTTPError:
+                raise
+            except requests.RequestException:
+                # Muut verkkovirheet eivät toistu uudelleenyrityksellä, mutta vapauttavat koetuksen
+                self.breaker.failure()
+                raise
+
+            if attempt == retries:
+                self.breaker.failure()
+                raise error
+            # Eksponentiaalinen backoff + jitter, ettei kaikki yritykset osu samaan hetkeen
+            time.sleep(backoff * (2 ** attempt) * (1 + random.random()))
+
+    def conditional_stats(self):
+        """Palauttaa ehdollisten pyyntöjen osumat (304) ja ohitukset (koko vastaus)"""
+        with self._lock:
+            return {**self._conditional, "cached_urls": len(self._validators)}
+
+    def latency_stats(self):
+        """Palauttaa endpointkohtaiset laskurit (kpl, virheet, keskiarvo ja maksimi ms)"""
+        with self._lock:
+            return {
+                label: {
+                    "count": s["count"],
+                    "errors": s["errors"],
+                    "avg_ms": round(s["total_ms"] / s["count"], 1) if s["count"] else 0.0,
+                    "max_ms": round(s["max_ms"], 1),
+                }
+                for label, s in sorted(self._stats.items())
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats.clear()
+            self._conditional = {"hits": 0, "misses": 0}
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Prosessin yhteinen NHLClient (luodaan ensimmäisellä kutsulla)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = NHLClient()
+    return _client
@@ -0,0 +1,274 @@
+import functools
+import hashlib
+import json
+import logging
+import time
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Tuple
+
+import pandas as pd
+
+from live_scoring import STAT_FIELDS, write_json_atomic
+from scoring_rules import SCORING, score_points
+
+logger = logging.getLogger(__name__)
+
+ROSTER_FILE = "olympic_players.csv"
+# Valmiiksi laskettu avaintaulu tallennetaan rosterin viereen ja luetaan käynnistyksessä
+KEY_TABLE_FILE = "olympic_players.keys.json"
+KEY_TABLE_VERSION = 2
+# nhlId = NHL:n oma playerId (fetch_ids.py:n tulos); puuttuessa käytetään nimiavainta
+ROSTER_COLUMNS = ["firstName", "lastName", "teamName", "position", "nhlId"]
+
+PLAYER_COLUMNS = ["playerId", "firstName", "lastName", "teamName", "position", *STAT_FIELDS, "points"]
+# game_login (Leaderboardin drill-down) sarakkeet
+GAME_LOG_COLUMNS = ["Game", "Player", "G", "A", "TOI", "Saves", "Decision"]
+
+
+def clean_names(names):
+    """Sama kuin live_scoring.clean_name, mutta koko sarakkeelle kerralla"""
+    return (
+        names.astype(str)
+        .str.normalize('NFKD')
+        .str.encode('ascii', 'ignore')
+        .str.decode('ascii')
+        .str.lower()
+        .str.strip()
+        .str.replace(r"[ _.]", "", regex=True)
+    )
+
+
+def short_keys(roster):
+    """Sama kuin create_short_key(...) + "_maa" jokaiselle rosterin riville"""
+    first = roster["firstName"].astype(str)
+    last = roster["lastName"].astype(str)
+    name_key = first.str[0].str.lower() + clean_names(last)
+    # create_short_key palauttaa tyhjän, jos etu- tai sukunimi puuttuu
+    name_key = name_key.where((first != "") & (last != ""), "")
+    return name_key + "_" + clean_names(roster["teamName"])
+
+
+def load_roster(path=ROSTER_FILE):
+    """Lukee rosterin; palauttaa (DataFrame, onnistuiko lataus)"""
+    try:
+        roster = pd.read_csv(path, dtype=str, keep_default_na=False)
+    except Exception:
+        return pd.DataFrame(columns=ROSTER_COLUMNS).astype({"nhlId": "Int64"}), False
+
+    # fetch_ids.py kirjoittaa NHL-ID:n playerId-sarakkeeseen
+    if "nhlId" not in roster.columns:
+        roster["nhlId"] = roster["playerId"] if "playerId" in roster.columns else ""
+    roster["nhlId"] = pd.to_numeric(roster["nhlId"], errors="coerce").astype("Int64")
+    return roster[ROSTER_COLUMNS], True
+
+
+def _file_sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _read_key_table(key_path, roster_sha):
+    try:
+        with open(key_path, encoding="utf-8") as f:
+            table = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if table.get("version") != KEY_TABLE_VERSION or table.get("roster_sha256") != roster_sha:
+        return None
+    frame = pd.DataFrame(table["rows"], columns=ROSTER_COLUMNS + ["playerId"])
+    return frame.astype({"nhlId": "Int64"})
+
+
+def _write_key_table(key_path, roster_sha, table):
+    payload = {
+        "version": KEY_TABLE_VERSION,
+        "roster_sha256": roster_sha,
+        "rows": [
+            [None if pd.isna(v) else (int(v) if c == "nhlId" else v) for c, v in zip(ROSTER_COLUMNS + ["playerId"], row)]
+            for row in table[ROSTER_COLUMNS + ["playerId"]].itertuples(index=False)
+        ],
+    }
+    try:
+        write_json_atomic(key_path, payload, ensure_ascii=False)
+    except OSError as e:
+        # Vain luku -levyllä taulu lasketaan joka käynnistyksessä, mikä on silti oikein
+        logger.warning("Could not persist roster key table: %s", e)
+
+
+@functools.lru_cache(maxsize=None)
+def load_roster_table(path=ROSTER_FILE, key_path=KEY_TABLE_FILE):
+    """
+    Roster valmiine avaimineen (playerId-sarake). Luetaan avaintaulusta, jos se vastaa
+    rosterin sisältöä; muuten avaimet lasketaan ja taulu tallennetaan. Kerran per prosessi.
+    Palauttaa (DataFrame, onnistuiko lataus); DataFrame on jaettu, älä muokkaa.
+    """
+    roster, csv_loaded = load_roster(path)
+    if not csv_loaded:
+        return roster.assign(playerId=pd.Series(dtype=str)), False
+
+    roster_sha = _file_sha256(path)
+    table = _read_key_table(key_path, roster_sha)
+    if table is None or len(table) != len(roster):
+        table = roster.assign(playerId=short_keys(roster))
+        _write_key_table(key_path, roster_sha, table)
+    return table, True
+
+
+def stats_frame(live_stats):
+    """
+    {playerId: {*STAT_FIELDS, 'name_key'}} → (tilastot NHL-ID:n mukaan,
+    tilastot nimiavaimen mukaan summattuna)
+    """
+    columns = list(STAT_FIELDS)
+    rows = [(k, v['name_key'], *(v.get(c, 0) for c in columns)) for k, v in live_stats.items()]
+    stats = pd.DataFrame(rows, columns=["key", "name_key"] + columns)
+    is_id = stats["key"].map(lambda k: isinstance(k, int)).astype(bool)
+    by_id = stats[is_id].set_index(stats.loc[is_id, "key"].astype("int64"))[columns]
+    by_name = stats.groupby("name_key")[columns].sum()
+    return by_id.astype("int64"), by_name.astype("int64")
+
+
+def build_players_frame(roster, live_stats, rules=SCORING):
+    """
+    Yhdistää rosterin ja live-tilastot: rivit, joilla on nhlId, liitetään suoraan
+    kokonaislukuavaimella; muut nimiavaimella (varapolku). Pisteet lasketaan
+    sääntöjen painoilla (oletuksena config.SCORING).
+    """
+    if "playerId" in roster.columns:
+        players = roster
+    else:
+        players = roster.assign(playerId=short_keys(roster))
+    by_id, by_name = stats_frame(live_stats)
+
+    has_id = players["nhlId"].notna()
+    id_stats = players[["nhlId"]].join(by_id, on="nhlId")
+    name_stats = players[["playerId"]].join(by_name, on="playerId")
+
+    players = players.assign(
+        **{c: id_stats[c].where(has_id, name_stats[c]).fillna(0).astype("int64") for c in STAT_FIELDS},
+        matchedBy=has_id.map({True: "id", False: "name"}),
+    )
+    players["points"] = score_points(players, rules)
+    return players[PLAYER_COLUMNS + ["nhlId", "matchedBy"]].reset_index(drop=True)
+
+
+def player_records(players):
+    """Sivujen käyttämä muoto: lista pelaajia, nimet {"default": ...} -muodossa"""
+    return [
+        {
+            "playerId": pid,
+            "firstName": {"default": first},
+            "lastName": {"default": last},
+            "teamName": {"default": country},
+            "position": pos,
+            "goals": int(goals),
+            "assists": int(assists),
+            "wins": int(wins),
+            "shutouts": int(shutouts),
+            "points": int(points),
+        }
+        for pid, first, last, country, pos, goals, assists, wins, shutouts, points in zip(
+            *(players[c] for c in PLAYER_COLUMNS)
+        )
+    ]
+
+
+def freeze_records(records):
+    """player_records vain luettavaksi: tuple, jonka rivit (ja nimikentät) ovat MappingProxyTypejä"""
+    return tuple(
+        MappingProxyType({k: MappingProxyType(v) if isinstance(v, dict) else v for k, v in record.items()})
+        for record in records
+    )
+
+
+class PlayerTable(NamedTuple):
+    """
+    Yhden snapshot-version pelaajat kaikissa sivujen tarvitsemissa muodoissa. Jaetaan
+    prosessin kaikkien sessioiden kesken sellaisenaan, joten mitään osaa ei saa muokata.
+    """
+    version: int
+    frame: pd.DataFrame
+    records: Tuple
+    by_id: Mapping
+    debug: Mapping
+    build_ms: float = 0.0
+
+
+def build_player_table(version, live_stats):
+    """Rakentaa snapshotin pelaajataulun; täsmäytyksen debug-yhteenveto kulkee samassa taulussa"""
+    started = time.perf_counter()
+    roster, csv_loaded = load_roster_table()
+    frame = build_players_frame(roster, live_stats)
+    records = freeze_records(player_records(frame))
+    return PlayerTable(
+        version=version,
+        frame=frame,
+        records=records,
+        by_id=MappingProxyType({p['playerId']: p for p in records}),
+        debug=MappingProxyType(players_debug(frame, live_stats, csv_loaded)),
+        build_ms=(time.perf_counter() - started) * 1000,
+    )
+
+
+def players_debug(players, live_stats, csv_loaded):
+    """Admin-paneelin yhteenveto täsmäytyksestä"""
+    scored = players[(players[list(STAT_FIELDS)] > 0).any(axis=1)]
+    head = players.head(10)
+    return {
+        "csv_loaded": csv_loaded,
+        "csv_players": len(players),
+        "api_players_with_stats": len(live_stats),
+        "matched_in_roster": len(scored),
+        "name_fallback_rows": int((players["matchedBy"] == "name").sum()),
+        "total_points": int(scored["points"].sum()),
+        "api_sample_keys": [f"{k} ({v['name_key']})" for k, v in list(live_stats.items())[:10]],
+        "debug_comparison": [
+            {
+                'name': f"{first} {last}",
+                'country': country,
+                'short_key': key,
+                'nhl_id': None if pd.isna(nhl_id) else int(nhl_id),
+                'found': goals > 0 or assists > 0,
+                'stats': {'goals': int(goals), 'assists': int(assists)},
+            }
+            for first, last, country, key, nhl_id, goals, assists in zip(
+                head["firstName"], head["lastName"], head["teamName"],
+                head["playerId"], head["nhlId"], head["goals"], head["assists"],
+            )
+        ],
+        "sample_matches": [
+            f"{first} {last} ({country}): {goals}G {assists}A"
+            for first, last, country, goals, assists in zip(
+                scored["firstName"].head(5), scored["lastName"].head(5), scored["teamName"].head(5),
+                scored["goals"].head(5), scored["assists"].head(5),
+            )
+        ],
+    }
+
+
+def game_log(players, rows, player_ids):
+    """
+    Valittujen pelaajien rivit peleittäin (drill-down). Boxscoren rivit liitetään
+    rosteriin NHL-ID:llä, rosteririvit ilman nhlId:tä nimiavaimella.
+    """
+    picked = players[players["playerId"].isin(player_ids)].drop_duplicates("playerId")
+    has_id = picked["nhlId"].notna()
+    id_map = pd.Series(picked.loc[has_id, "playerId"].to_numpy(), index=picked.loc[has_id, "nhlId"].astype("int64"))
+    name_map = pd.Series(picked.loc[~has_id, "playerId"].to_numpy(), index=picked.loc[~has_id, "playerId"].to_numpy())
+
+    owner = rows["player_id"].map(id_map).fillna(rows["name_key"].map(name_map))
+    if not owner.notna().any():
+        # Ei yhtään osumaa (pelaajat eivät ole pelanneet tai nimiavain ei täsmää): tyhjä
+        # owner on float64, jota ei voi liittää merkkijonosarakkeeseen
+        return pd.DataFrame(columns=GAME_LOG_COLUMNS)
+    log = rows[owner.notna()].assign(playerId=owner[owner.notna()])
+    log = log.merge(picked[["playerId", "firstName", "lastName"]], on="playerId")
+    return pd.DataFrame({
+        "Game": log["game_id"],
+        "Player": log["firstName"] + " " + log["lastName"],
+        "G": log["goals"],
+        "A": log["assists"],
+        "TOI": (log["toi"] // 60).astype(str) + ":" + (log["toi"] % 60).astype(str).str.zfill(2),
+        "Saves": log["saves"],
+        "Decision": log["decision"],
+    }).sort_values(["Game", "Player"], kind="stable").reset_index(drop=True)
@@ -0,0 +1,101 @@
+from collections import defaultdict
+from typing import Dict, List, NamedTuple
+
+import pandas as pd
+
+from lineup_matrix import LineupMatrix
+
+# Maat, joilla on vähemmän managereita, yhdistetään "Others"-ryhmään
+MIN_MANAGERS_PER_COUNTRY = 3
+
+
+class ScoreIndex(NamedTuple):
+    """Yhdellä kertaa lasketut joukkuepisteet, sijoitukset ja maakohtaiset koosteet"""
+    player_map: Dict
+    team_points: Dict[str, int]
+    team_ranks: Dict[str, int]
+    teams_by_name: Dict[str, Dict]
+    leaderboard: pd.DataFrame
+    country_leaderboard: List[Dict]
+    country_participation: Dict[str, int]
+    total_points: int
+
+
+def _country_leaderboard(teams, team_points, country_names):
+    country_points = defaultdict(list)
+    for team in teams:
+        country_points[team.get("manager_country", "OTHERS")].append(team_points[team['team_name']])
+
+    final_stats = defaultdict(lambda: {"points": [], "managers": 0, "countries": []})
+
+    for country, points_list in country_points.items():
+        if len(points_list) < MIN_MANAGERS_PER_COUNTRY:
+            final_stats["OTHERS"]["points"].extend(points_list)
+            final_stats["OTHERS"]["managers"] += len(points_list)
+            final_stats["OTHERS"]["countries"].append(country)
+        else:
+            final_stats[country]["points"] = points_list
+            final_stats[country]["managers"] = len(points_list)
+            final_stats[country]["countries"] = [country]
+
+    results = []
+    for group_code, data in final_stats.items():
+        if data["managers"] > 0:
+            avg = sum(data["points"]) / len(data["points"]) if data["points"] else 0
+            results.append({
+                "code": group_code,
+                "name": "Others" if group_code == "OTHERS" else country_names.get(group_code, group_code),
+                "managers": data["managers"],
+                "countries": data["countries"],
+                "avg_points": round(avg, 1),
+                "total_points": sum(data["points"]),
+                "best_score": max(data["points"]) if data["points"] else 0
+            })
+
+    results.sort(key=lambda x: x["avg_points"], reverse=True)
+    return results
+
+
+def build_score_index(players, teams, country_names, format_country=str, lineups=None):
+    """
+    Laskee kaikkien joukkueiden pisteet kerralla LineupMatrixilla. `lineups` voidaan
+    antaa valmiina, kun joukkueet eivät ole muuttuneet. Tulos on tarkoitettu vain
+    luettavaksi: se jaetaan kaikkien sessioiden kesken.
+    """
+    player_map = {p['playerId']: p for p in players}
+    points_by_id = {pid: p['points'] for pid, p in player_map.items()}
+
+    if lineups is None:
+        lineups = LineupMatrix(player_map, teams)
+    totals = lineups.team_totals(lineups.points_vector(points_by_id)).tolist()
+
+    team_points = {}
+    teams_by_name = {}
+    country_participation = defaultdict(int)
+    rows = []
+    for team, pts in zip(teams, totals):
+        name = team['team_name']
+        team_points[name] = pts
+        teams_by_name[name] = team
+        country_participation[team.get('manager_country', 'UNK')] += 1
+        rows.append({
+            "Team": name,
+            "Manager": format_country(team.get("manager_country", "UNK")),
+            "Points": pts,
+        })
+
+    leaderboard = pd.DataFrame(rows, columns=["Team", "Manager", "Points"])
+    leaderboard = leaderboard.sort_values("Points", ascending=False, kind="stable").reset_index(drop=True)
+    leaderboard.index += 1
+    team_ranks = {name: rank for rank, name in zip(leaderboard.index, leaderboard["Team"])}
+
+    return ScoreIndex(
+        player_map=player_map,
+        team_points=team_points,
+        team_ranks=team_ranks,
+        teams_by_name=teams_by_name,
+        leaderboard=leaderboard,
+        country_leaderboard=_country_leaderboard(teams, team_points, country_names),
+        country_participation=dict(country_participation),
+        total_points=sum(team_points.values()),
+    )
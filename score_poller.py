@@ -0,0 +1,400 @@
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from live_scoring import (
+    FINAL_GAME_STATES,
+    aggregate_rows,
+    box_rows,
+    crawl_live_scoring,
+    game_cache,
+    retry_failed_games,
+    schedule_catalog,
+)
+
+logger = logging.getLogger(__name__)
+
+# Kuinka usein taustasäie hakee NHL API:sta (sekuntia), jos otteluohjelmaa ei käytetä
+POLL_INTERVAL = 60
+
+# Otteluohjelman mukainen tahti: tiheästi pelin aikana ja juuri ennen alkua, harvoin pelien välillä
+LIVE_POLL_INTERVAL = 30
+IDLE_POLL_INTERVAL = 30 * 60
+PREGAME_WINDOW = timedelta(minutes=15)
+
+# Kuinka kauan ensimmäinen sivulataus odottaa ensimmäistä snapshotia
+FIRST_SNAPSHOT_TIMEOUT = 30
+
+# Jaetussa säilössä muut prosessit tarkistavat snapshotin version tämän välein
+STORE_SYNC_INTERVAL = 15
+# Hakijan lease kestää seuraavaan suunniteltuun hakuun + tämän verran; sen jälkeen rooli vapautuu
+LEASE_GRACE = 60
+
+# Epäonnistuneet pelit haetaan uudelleen erikseen: 5 s, 10 s, 20 s... seuraavaan täyteen hakuun asti
+RETRY_BASE_DELAY = 5
+
+# Käynnissä olevat haut koko prosessissa: jos uusi haku alkaa toisen ollessa kesken
+# (esim. vanha poller jäi eloon välimuistin tyhjennyksen jälkeen), se lasketaan päällekkäiseksi
+_active_fetches = 0
+_active_lock = threading.Lock()
+
+
+class ScoreSnapshot(NamedTuple):
+    """
+    Muuttumaton tilannekuva pisteistä: {playerId: {'goals', 'assists', 'name_key'}}.
+    failed_games = pelit, joiden boxscorea ei saatu (mukana edellisen haun luvuin, jos ne on).
+    box_rows = pelaajien rivit peleittäin (BOX_COLUMNS) drill-downia varten; jaettu, älä muokkaa.
+    """
+    live_stats: Mapping
+    fetched_at: Optional[datetime]
+    version: int
+    games: int = 0
+    failed_games: Tuple = ()
+    schedule_failures: int = 0
+    box_rows: Optional[pd.DataFrame] = None
+
+    @property
+    def complete(self):
+        return not self.failed_games and not self.schedule_failures
+
+
+EMPTY_SNAPSHOT = ScoreSnapshot(MappingProxyType({}), None, 0)
+
+
+class PollPlan(NamedTuple):
+    """poll = haetaanko nyt; interval = sekunnit seuraavaan hakuun (None = vasta pyydettäessä)"""
+    poll: bool
+    interval: Optional[float]
+    reason: str
+
+
+def _start_time(game):
+    start = game.get('startTimeUTC')
+    if not start:
+        return None
+    return datetime.fromisoformat(start.replace("Z", "+00:00"))
+
+
+def plan_next_poll(catalog=None, cache=None, now=None, not_before=None):
+    """
+    Päättää otteluohjelmasta, milloin seuraavaksi haetaan: LIVE_POLL_INTERVAL, kun peli
+    on käynnissä tai alkamassa, pelien välillä seuraavan pelin alkuun (enintään
+    IDLE_POLL_INTERVAL), ei lainkaan ennen not_before-hetkeä (paikallista aikaa) eikä
+    turnauksen päätyttyä.
+    """
+    catalog = catalog or schedule_catalog
+    cache = cache or game_cache
+    now = now or datetime.now(timezone.utc)
+    if not_before is not None:
+        local_now = now.astimezone().replace(tzinfo=None)
+        if local_now < not_before:
+            wait = (not_before - local_now).total_seconds()
+            return PollPlan(False, wait, "before deadline")
+
+    games = catalog.all_games()
+    if not games:
+        return PollPlan(True, LIVE_POLL_INTERVAL, "schedule not loaded")
+    if catalog.is_final():
+        return PollPlan(False, None, "tournament finished")
+
+    next_start = None
+    for game in games:
+        state = cache.state(game['id']) or game.get('gameState')
+        if state in FINAL_GAME_STATES:
+            continue
+        start = _start_time(game)
+        if start is None or start - PREGAME_WINDOW <= now:
+            return PollPlan(True, LIVE_POLL_INTERVAL, "game live or starting")
+        if next_start is None or start < next_start:
+            next_start = start
+
+    if next_start is None:
+        # Kaikki tunnetut pelit päättyneet, mutta turnauspäiviä on jäljellä
+        return PollPlan(True, IDLE_POLL_INTERVAL, "between games")
+    wait = (next_start - PREGAME_WINDOW - now).total_seconds()
+    return PollPlan(True, max(LIVE_POLL_INTERVAL, min(wait, IDLE_POLL_INTERVAL)), "between games")
+
+
+def snapshot_age(snapshot, now=None):
+    """Snapshotin ikä sekunteina; None, jos hakua ei ole vielä onnistunut"""
+    if snapshot.fetched_at is None:
+        return None
+    return ((now or datetime.now()) - snapshot.fetched_at).total_seconds()
+
+
+def freeze_stats(live_stats):
+    """Kääntää live_stats-sanakirjan vain luettavaksi, jotta lukijat eivät voi muuttaa sitä"""
+    return MappingProxyType({k: MappingProxyType(dict(v)) for k, v in live_stats.items()})
+
+
+class ScorePoller:
+    """Taustasäie, joka hakee pisteet omassa tahdissaan ja julkaisee aina uuden snapshotin"""
+
+    def __init__(self, fetch=crawl_live_scoring, retry=retry_failed_games, interval=POLL_INTERVAL, plan=None,
+                 store=None, cache=game_cache, catalog=schedule_catalog):
+        self._fetch = fetch
+        self._retry = retry
+        self._store = store
+        self._cache = cache
+        self._catalog = catalog
+        self.warm_started = False
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.role = "refresher"
+        self.interval = interval
+        self._plan = plan
+        self.plan = PollPlan(True, interval, "fixed interval")
+        self.next_poll_at = None
+        self._snapshot = EMPTY_SNAPSHOT
+        self._result = None
+        self._ready = threading.Event()
+        self._wake = threading.Event()
+        self._flight_lock = threading.Lock()
+        self._in_flight = None
+        self._thread = None
+        self.last_error = None
+        self.fetches = 0
+        self.coalesced = 0
+        self.duplicates = 0
+        self.game_retries = 0
+
+    def start(self):
+        if self._thread is None:
+            self._warm_start()
+            self._thread = threading.Thread(target=self._run, name="score-poller", daemon=True)
+            self._thread.start()
+        return self
+
+    def _warm_start(self):
+        """Julkaisee tallennetun snapshotin heti; taustahaku päivittää sen perässä"""
+        if self._store is not None:
+            self.warm_started = self._load_from_store()
+
+    def _load_from_store(self):
+        saved = self._store.load()
+        if saved is None:
+            return False
+        result, version, fetched_at, game_states = saved
+        # Päättyneet pelit menevät pelivälimuistiin, joten niitä ei haeta uudelleen
+        for game_id, state in game_states.items():
+            self._cache.store(game_id, state, result.game_stats[game_id])
+        # Otteluohjelma samasta snapshotista: ensimmäinen haku ei riipu schedule-hausta
+        self._catalog.seed(result.schedule)
+        self._publish(result, fetched_at, version, save=False)
+        return True
+
+    def _store_version(self):
+        try:
+            return self._store.current_version()
+        except Exception:
+            logger.exception("Reading shared snapshot version failed")
+            return None
+
+    def _elected(self, plan):
+        """Jaetussa säilössä vain lease-haltija hakee; muut lukevat säilöä"""
+        if self._store is None or not self._store.shared:
+            return True
+        ttl = (plan.interval if plan.interval is not None else IDLE_POLL_INTERVAL) + LEASE_GRACE
+        return self._store.acquire_lease(self.owner, ttl)
+
+    def _follow(self):
+        """Lukee jaetun snapshotin vain, jos sen versio on muuttunut"""
+        version = self._store_version()
+        if version is not None and version != self._snapshot.version:
+            try:
+                self._load_from_store()
+            except Exception:
+                logger.exception("Reading shared snapshot failed")
+        self._ready.set()
+
+    def _next_plan(self):
+        if self._plan is None:
+            return PollPlan(True, self.interval, "fixed interval")
+        try:
+            return self._plan()
+        except Exception:
+            logger.exception("Poll planning failed, using fixed interval")
+            return PollPlan(True, self.interval, "fixed interval")
+
+    def _run(self):
+        forced = False
+        while True:
+            try:
+                forced = self._cycle(forced)
+            except Exception as e:
+                # Odottamaton virhe (esim. säilön kirjoitus) ei saa pysäyttää säiettä pysyvästi
+                logger.exception("Score poller cycle failed")
+                self.last_error = str(e)
+                self._ready.set()
+                forced = self._wake.wait(RETRY_BASE_DELAY)
+                self._wake.clear()
+
+    def _cycle(self, forced):
+        """Yksi kierros: haku tai säilön seuranta ja odotus seuraavaan; palauttaa, herätettiinkö"""
+        plan = self._next_plan()
+        if not self._elected(plan):
+            self.role = "follower"
+            self._follow()
+            self.plan = PollPlan(False, STORE_SYNC_INTERVAL, "following shared store")
+            self.next_poll_at = datetime.now() + timedelta(seconds=STORE_SYNC_INTERVAL)
+            self._wake.wait(STORE_SYNC_INTERVAL)
+            self._wake.clear()
+            return forced
+        self.role = "refresher"
+        # Päättyneen turnauksen lopputulos haetaan silti kerran prosessin alussa
+        if plan.poll or forced or (plan.interval is None and self._result is None):
+            self.refresh()
+            # Haku päivitti otteluohjelman, joten seuraava väli lasketaan uudelleen
+            plan = self._next_plan()
+            self._elected(plan)
+        else:
+            # Snapshotia ei ole tulossa: sivut eivät jää odottamaan ensimmäistä hakua
+            self._ready.set()
+        self.plan = plan
+        if plan.interval is None:
+            self.next_poll_at = None
+            next_full = float("inf")
+        else:
+            self.next_poll_at = datetime.now() + timedelta(seconds=plan.interval)
+            next_full = time.monotonic() + plan.interval
+        # Vajaa snapshot täydennetään hakemalla vain puuttuvat pelit lyhyin välein
+        delay = RETRY_BASE_DELAY
+        while self._snapshot.failed_games and time.monotonic() + delay < next_full:
+            if self._wake.wait(delay):
+                break
+            self.retry_failed()
+            delay *= 2
+        if next_full == float("inf"):
+            self._wake.wait()
+        else:
+            self._wake.wait(max(0.0, next_full - time.monotonic()))
+        forced = self._wake.is_set()
+        self._wake.clear()
+        return forced
+
+    def refresh(self, wait=True):
+        """
+        Hakee pisteet ja julkaisee uuden snapshotin (single-flight). Jos haku on jo
+        käynnissä, kutsuja ei aloita omaansa vaan odottaa sen tuloksen (wait=True)
+        tai saa heti edellisen snapshotin (wait=False).
+        """
+        return self._single_flight(self._crawl, wait)
+
+    def retry_failed(self):
+        """Hakee edellisen haun epäonnistuneet pelit ja yhdistää ne snapshotiin"""
+        if not (self._result and self._result.failed_games):
+            return self._snapshot
+        return self._single_flight(self._retry_games, True)
+
+    def _crawl(self):
+        self.fetches += 1
+        result = self._fetch()
+        previous = self._result
+        if previous and (result.failed_games or result.schedule_failures):
+            # Epäonnistunut peli näytetään edellisen haun luvuin, kunnes uusintahaku onnistuu.
+            # Jos otteluohjelmakin jäi vajaaksi, haku ei välttämättä tuntenut kaikkia pelejä:
+            # silloin kaikki edellisen haun pelit, jotka puuttuvat nyt, pidetään mukana
+            missing = {g['id'] for g in result.failed_games}
+            if result.schedule_failures:
+                missing |= previous.game_stats.keys() - result.game_stats.keys()
+            carried = {gid: previous.game_stats[gid] for gid in missing if gid in previous.game_stats}
+            result = result._replace(game_stats={**carried, **result.game_stats})
+        return result
+
+    def _retry_games(self):
+        self.game_retries += 1
+        result = self._retry(self._result)
+        if result.failed_games == self._result.failed_games:
+            # Mikään ei muuttunut: ei uutta versiota, ettei pisteitä lasketa turhaan uudelleen
+            return self._result
+        return result
+
+    def _single_flight(self, work, wait):
+        with self._flight_lock:
+            flight = self._in_flight
+            leader = flight is None
+            if leader:
+                flight = self._in_flight = threading.Event()
+            else:
+                self.coalesced += 1
+        if not leader:
+            if wait:
+                flight.wait()
+            return self._snapshot
+
+        global _active_fetches
+        with _active_lock:
+            if _active_fetches:
+                self.duplicates += 1
+            _active_fetches += 1
+        try:
+            result = work()
+        except Exception as e:
+            logger.exception("Score refresh failed")
+            self.last_error = str(e)
+            return self._snapshot
+        else:
+            self.last_error = None
+            self._publish(result)
+            return self._snapshot
+        finally:
+            with _active_lock:
+                _active_fetches -= 1
+            with self._flight_lock:
+                self._in_flight = None
+            # Myös epäonnistunut ensimmäinen haku vapauttaa latest()-odottajat: sivu näyttää
+            # tyhjän snapshotin ("Waiting for the first scores") eikä jää odottamaan timeoutia
+            self._ready.set()
+            flight.set()
+
+    def _publish(self, result, fetched_at=None, version=None, save=True):
+        if result is self._result:
+            return
+        self._result = result
+        failed_ids = tuple(g['id'] for g in result.failed_games)
+        games = len(set(result.game_stats) | set(failed_ids))
+        rows = box_rows(result.game_stats)
+        # Snapshot vaihdetaan yhdellä sijoituksella: lukijat näkevät joko vanhan tai uuden
+        self._snapshot = ScoreSnapshot(
+            freeze_stats(aggregate_rows(rows)),
+            fetched_at or datetime.now(),
+            version or self._next_version(save),
+            games, failed_ids, result.schedule_failures, rows,
+        )
+        self._ready.set()
+        if save and self._store is not None:
+            states = {game_id: self._cache.state(game_id) for game_id in result.game_stats}
+            self._store.save(result, self._snapshot.version, self._snapshot.fetched_at, states)
+
+    def _next_version(self, save):
+        version = self._snapshot.version + 1
+        if save and self._store is not None and self._store.shared:
+            # Uusi hakija jatkaa jaetun säilön versiosta, jotta lukijat huomaavat muutoksen
+            version = max(version, (self._store_version() or 0) + 1)
+        return version
+
+    def flight_stats(self):
+        """Admin-paneelin laskurit: tehdyt haut, yhdistetyt kutsut ja päällekkäiset haut"""
+        return {
+            "fetches": self.fetches,
+            "coalesced": self.coalesced,
+            "duplicates": self.duplicates,
+            "game_retries": self.game_retries,
+        }
+
+    def request_refresh(self):
+        """Herättää taustasäikeen hakemaan heti"""
+        self._wake.set()
+
+    def latest(self, timeout=None):
+        """Palauttaa viimeisimmän snapshotin; timeout odottaa ensimmäistä hakua"""
+        if timeout:
+            self._ready.wait(timeout)
+        return self._snapshot
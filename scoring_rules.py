@@ -0,0 +1,41 @@
+import numpy as np
+
+from config import SCORING
+
+# Pisteytyssääntö → pelaajataulun tilastosarake. Uusi sääntö: rivi tähän, painoarvo
+# config.SCORING:iin ja sarake live_scoring.STAT_FIELDS-listaan
+RULE_STATS = {
+    "goal": "goals",
+    "assist": "assists",
+    "win": "wins",
+    "shutout": "shutouts",
+}
+
+# Maalivahtien säännöt: kokoonpanoon voi valita vain hyökkääjiä ja puolustajia (F/D),
+# joten nämä eivät toistaiseksi kerry yhdenkään joukkueen pisteisiin
+GOALIE_RULES = ("win", "shutout")
+
+
+def lineup_rules(rules=SCORING):
+    """Säännöt, joilla F/D-kokoonpano voi saada pisteitä (näytetään käyttöliittymässä)"""
+    return {rule: weight for rule, weight in rules.items() if rule not in GOALIE_RULES}
+
+
+def rule_weights(rules=SCORING):
+    """Säännöt → (sarakkeet, painovektori); tuntematon sääntö on virhe eikä ohiteta hiljaa"""
+    unknown = set(rules) - set(RULE_STATS)
+    if unknown:
+        raise ValueError(f"Unknown scoring rules: {', '.join(sorted(unknown))}")
+    columns = [RULE_STATS[rule] for rule in rules]
+    return columns, np.array([rules[rule] for rule in rules], dtype=np.int64)
+
+
+def score_points(stats, rules=SCORING):
+    """
+    Fantasiapisteet kaikille riveille yhdellä matriisi-vektoritulolla:
+    (pelaajat × tilastot) @ painot. `stats` on DataFrame, jossa RULE_STATS-sarakkeet.
+    """
+    columns, weights = rule_weights(rules)
+    if not columns:
+        return np.zeros(len(stats), dtype=np.int64)
+    return stats[columns].to_numpy(dtype=np.int64) @ weights
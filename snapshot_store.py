@@ -0,0 +1,232 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from live_scoring import BOX_COLUMNS, CrawlResult, write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+# Viimeisin snapshot pelikohtaisine tietoineen tallennetaan tähän; luetaan prosessin alussa
+SNAPSHOT_FILE = "score_snapshot.json"
+# Kasvata, kun tiedoston muoto muuttuu: vanhaa muotoa ei lueta vaan tehdään kylmä haku
+SNAPSHOT_FORMAT = 3
+# game_id on pelin avain, joten sitä ei toisteta jokaisella rivillä
+STORED_COLUMNS = [c for c in BOX_COLUMNS if c != "game_id"]
+
+# Jaetut säilöt: prosessit lukevat samaa snapshotia, vain yksi (lease-haltija) hakee NHL API:sta
+SQLITE_FILE = "score_snapshot.db"
+FIRESTORE_COLLECTION = "live_scores"
+
+
+def encode_snapshot(result, version, fetched_at, game_states):
+    """
+    CrawlResult → tiivis JSON-muoto. Pelin rivit tallennetaan sarakkeittain (BOX_COLUMNS
+    ilman game_id:tä); key-sarakkeessa kokonaislukuavaimet (NHL playerId) ja nimiavaimet
+    säilyvät erillään.
+    """
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "version": version,
+        "fetched_at": fetched_at.isoformat() if fetched_at else None,
+        "games": [
+            [game_id, game_states.get(game_id), {c: rows[c].tolist() for c in STORED_COLUMNS}]
+            for game_id, rows in result.game_stats.items()
+        ],
+        "failed_games": list(result.failed_games),
+        "schedule_failures": result.schedule_failures,
+        "schedule": result.schedule,
+    }
+
+
+def decode_snapshot(payload):
+    """Käänteinen encode_snapshotille: (CrawlResult, versio, fetched_at, {game_id: gameState})"""
+    game_stats = {}
+    game_states = {}
+    for game_id, state, columns in payload["games"]:
+        rows = pd.DataFrame({c: np.array(columns[c], dtype=BOX_COLUMNS[c]) for c in STORED_COLUMNS})
+        rows.insert(1, "game_id", game_id)
+        game_stats[game_id] = rows.astype({"game_id": BOX_COLUMNS["game_id"]})[list(BOX_COLUMNS)]
+        game_states[game_id] = state
+    fetched_at = payload.get("fetched_at")
+    result = CrawlResult(
+        game_stats, tuple(payload.get("failed_games", ())), payload.get("schedule_failures", 0),
+        payload.get("schedule"),
+    )
+    return result, payload["version"], datetime.fromisoformat(fetched_at) if fetched_at else None, game_states
+
+
+class SnapshotStore(ABC):
+    """
+    Snapshot-säilön rajapinta. Paikallinen säilö (shared = False) palvelee vain omaa
+    prosessiaan; jaetussa säilössä hakija valitaan lease-lukolla ja muut prosessit
+    lukevat snapshotin vasta, kun current_version() kertoo sen muuttuneen.
+    load ja save ovat pakollisia: puutteellinen säilö kaatuu jo luotaessa.
+    """
+    shared = False
+
+    @abstractmethod
+    def load(self):
+        """Palauttaa tallennetun snapshotin (ks. decode_snapshot) tai None"""
+
+    @abstractmethod
+    def save(self, result, version, fetched_at, game_states):
+        """Tallentaa snapshotin ja päättyneiden pelien tilat (game_states) versiolla `version`"""
+
+    def current_version(self):
+        """Tallennetun snapshotin versio ilman koko snapshotin lukemista; None = ei tiedossa"""
+        return None
+
+    def acquire_lease(self, owner, ttl):
+        """Varaa tai uusii hakijan roolin ttl sekunniksi; True, jos owner saa hakea"""
+        return True
+
+
+class FileSnapshotStore(SnapshotStore):
+    """Snapshot paikalliseen tiedostoon; kirjoitus väliaikaistiedoston ja os.replacen kautta"""
+
+    def __init__(self, path=SNAPSHOT_FILE):
+        self.path = path
+
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return _decode_payload(payload)
+
+    def save(self, result, version, fetched_at, game_states):
+        payload = encode_snapshot(result, version, fetched_at, game_states)
+        try:
+            write_json_atomic(self.path, payload, ensure_ascii=False, separators=(",", ":"))
+        except OSError as e:
+            logger.warning("Could not persist score snapshot: %s", e)
+
+
+def _decode_payload(payload):
+    if payload.get("format") != SNAPSHOT_FORMAT:
+        logger.info("Ignoring stored snapshot with format %s", payload.get("format"))
+        return None
+    try:
+        return decode_snapshot(payload)
+    except (KeyError, TypeError, ValueError) as e:
+        logger.warning("Could not decode stored snapshot: %s", e)
+        return None
+
+
+class SQLiteSnapshotStore(SnapshotStore):
+    """
+    Jaettu säilö SQLite-tiedostossa: saman koneen prosessit (esim. useampi Streamlit-
+    palvelin samalla levyllä). Yksi rivi snapshotille ja yksi leaselle.
+    """
+    shared = True
+
+    def __init__(self, path=SQLITE_FILE):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS snapshot (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER, payload TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS lease (id INTEGER PRIMARY KEY CHECK (id = 1), owner TEXT, expires_at REAL)")
+            conn.execute("INSERT OR IGNORE INTO lease (id, owner, expires_at) VALUES (1, NULL, 0)")
+
+    def _connect(self):
+        # sqlite3-yhteyttä ei saa jakaa säikeiden kesken: yksi yhteys per säie
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10)
+        return conn
+
+    def load(self):
+        row = self._connect().execute("SELECT payload FROM snapshot WHERE id = 1").fetchone()
+        if row is None:
+            return None
+        try:
+            return _decode_payload(json.loads(row[0]))
+        except ValueError:
+            return None
+
+    def save(self, result, version, fetched_at, game_states):
+        payload = json.dumps(encode_snapshot(result, version, fetched_at, game_states), separators=(",", ":"))
+        try:
+            with self._connect() as conn:
+                conn.execute("INSERT OR REPLACE INTO snapshot (id, version, payload) VALUES (1, ?, ?)", (version, payload))
+        except sqlite3.Error as e:
+            logger.warning("Could not persist score snapshot: %s", e)
+
+    def current_version(self):
+        row = self._connect().execute("SELECT version FROM snapshot WHERE id = 1").fetchone()
+        return row[0] if row else None
+
+    def acquire_lease(self, owner, ttl):
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                cur = conn.execute(
+                    "UPDATE lease SET owner = ?, expires_at = ? WHERE id = 1 AND (owner = ? OR owner IS NULL OR expires_at < ?)",
+                    (owner, now + ttl, owner, now),
+                )
+                return cur.rowcount == 1
+        except sqlite3.Error as e:
+            logger.warning("Could not acquire refresher lease: %s", e)
+            return False
+
+
+class FirestoreSnapshotStore(SnapshotStore):
+    """
+    Jaettu säilö Firestoressa eri koneilla ajettaville repliikoille. Pieni meta-dokumentti
+    (versio + lease) luetaan usein, snapshot-dokumentti vain version muuttuessa.
+    """
+    shared = True
+
+    def __init__(self, db, collection=FIRESTORE_COLLECTION):
+        self._db = db
+        self._meta = db.collection(collection).document("meta")
+        self._snapshot = db.collection(collection).document("snapshot")
+
+    def load(self):
+        snap = self._snapshot.get()
+        if not snap.exists:
+            return None
+        try:
+            return _decode_payload(json.loads(snap.to_dict()["payload"]))
+        except (KeyError, ValueError):
+            return None
+
+    def save(self, result, version, fetched_at, game_states):
+        payload = json.dumps(encode_snapshot(result, version, fetched_at, game_states), separators=(",", ":"))
+        try:
+            # Snapshot ensin: lukija, joka näkee uuden version, löytää myös uuden datan
+            self._snapshot.set({"version": version, "payload": payload})
+            self._meta.set({"version": version}, merge=True)
+        except Exception as e:
+            logger.warning("Could not persist score snapshot: %s", e)
+
+    def current_version(self):
+        snap = self._meta.get()
+        return snap.to_dict().get("version") if snap.exists else None
+
+    def acquire_lease(self, owner, ttl):
+        from firebase_admin import firestore
+
+        @firestore.transactional
+        def claim(transaction):
+            snap = self._meta.get(transaction=transaction)
+            meta = snap.to_dict() if snap.exists else {}
+            now = time.time()
+            if meta.get("owner") not in (None, owner) and meta.get("lease_expires", 0) > now:
+                return False
+            transaction.set(self._meta, {"owner": owner, "lease_expires": now + ttl}, merge=True)
+            return True
+
+        try:
+            return claim(self._db.transaction())
+        except Exception as e:
+            logger.warning("Could not acquire refresher lease: %s", e)
+            return False
@@ -0,0 +1,144 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TEAMS_COLLECTION = "teams"
+
+# Jos Firestore-kuuntelija ei ole käytössä, koko kokoelma ladataan uudelleen tämän välein
+TEAMS_TTL = 60
+
+# Yksittäisten joukkuehakujen (esim. kirjautuminen) välimuistin kesto, myös "ei löytynyt"
+LOOKUP_TTL = 30
+
+
+class TeamRepository:
+    """
+    Prosessin välimuisti teams-kokoelmalle. Firestoren on_snapshot-kuuntelija pitää
+    sen ajan tasalla; jos kuuntelijaa ei saada käyntiin, kokoelma luetaan TTL:n välein.
+    Palautetut joukkueet ovat jaettuja: niitä ei saa muokata paikan päällä.
+    """
+
+    def __init__(self, db, ttl=TEAMS_TTL):
+        self._db = db
+        self.ttl = ttl
+        self._teams = {}
+        self._list = []
+        self._loaded_at = None
+        self._lookups = {}
+        self._lock = threading.Lock()
+        self._watch = None
+        self.listening = False
+        self.version = 0
+        self.full_reloads = 0
+
+    def _collection(self):
+        return self._db.collection(TEAMS_COLLECTION)
+
+    def start(self):
+        """Käynnistää kuuntelijan; epäonnistuessa jäädään TTL-lataukseen"""
+        try:
+            self._watch = self._collection().on_snapshot(self._on_snapshot)
+        except Exception as e:
+            logger.warning("Teams listener unavailable, falling back to TTL reloads: %s", e)
+        return self
+
+    def _on_snapshot(self, col_snapshot, changes, read_time):
+        with self._lock:
+            for change in changes:
+                doc = change.document
+                if change.type.name == "REMOVED":
+                    self._teams.pop(doc.id, None)
+                else:
+                    data = doc.to_dict()
+                    data["id"] = doc.id
+                    self._teams[doc.id] = data
+            self._changed()
+            self._loaded_at = time.monotonic()
+            self.listening = True
+
+    def _changed(self):
+        # Kutsutaan lukon sisällä
+        self._list = list(self._teams.values())
+        self._lookups.clear()
+        self.version += 1
+
+    def _reload(self):
+        teams = {}
+        for doc in self._collection().stream():
+            data = doc.to_dict()
+            data["id"] = doc.id
+            teams[doc.id] = data
+        with self._lock:
+            self._teams = teams
+            self._changed()
+            self._loaded_at = time.monotonic()
+            self.full_reloads += 1
+
+    def _stale(self):
+        if self._loaded_at is None:
+            return True
+        return not self.listening and time.monotonic() - self._loaded_at > self.ttl
+
+    def all(self):
+        """Kaikki joukkueet välimuistista (ladataan vain kun välimuisti on vanhentunut)"""
+        if self._stale():
+            self._reload()
+        return self._list
+
+    def versioned(self):
+        """
+        (versio, joukkueet) saman lukon alla: kuuntelijan päivitys ei pääse väliin, joten
+        version mukaan välimuistitettu tulos on aina laskettu juuri tästä listasta.
+        """
+        if self._stale():
+            self._reload()
+        with self._lock:
+            return self.version, self._list
+
+    def get(self, team_name):
+        """
+        Yksi joukkue nimellä: kuuntelijan ollessa päällä suoraan muistista, muuten
+        yhdellä dokumenttihaulla. Tulos (myös puuttuva) muistetaan LOOKUP_TTL sekuntia.
+        """
+        if not team_name:
+            return None
+        with self._lock:
+            if self.listening:
+                return self._teams.get(team_name)
+            cached = self._lookups.get(team_name)
+        if cached and time.monotonic() - cached[0] < LOOKUP_TTL:
+            return cached[1]
+
+        snap = self._collection().document(team_name).get()
+        data = None
+        if snap.exists:
+            data = snap.to_dict()
+            data["id"] = snap.id
+        with self._lock:
+            self._lookups[team_name] = (time.monotonic(), data)
+        return data
+
+    def put(self, team_name, data):
+        """Päivittää tallennetun joukkueen välimuistiin heti kirjoituksen jälkeen"""
+        with self._lock:
+            self._teams[team_name] = {**data, "id": team_name}
+            self._changed()
+
+    def patch(self, team_name, fields):
+        with self._lock:
+            if team_name in self._teams:
+                self._teams[team_name] = {**self._teams[team_name], **fields}
+                self._changed()
+
+    def remove(self, team_name):
+        with self._lock:
+            if self._teams.pop(team_name, None) is not None:
+                self._changed()
+
+    def invalidate(self):
+        """Pakottaa seuraavan all()-kutsun lukemaan koko kokoelman"""
+        with self._lock:
+            self._loaded_at = None
+            self._lookups.clear()